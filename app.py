@@ -1,29 +1,107 @@
-from fastapi import FastAPI, Path, Query, Request, Form
-from fastapi.responses import FileResponse, JSONResponse
-from fastapi import HTTPException
-import mysql.connector
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 from dotenv import load_dotenv
+from mysql.connector import IntegrityError, errorcode
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi import Depends
-from utils.jwt import create_access_token, decode_access_token
+from utils.jwt import create_access_token, verify_access_token, token_cache_stats
+from utils.db import ConnectionPool, DBRunner, ReplicaRouter
+from utils.cache import TTLCache
+from utils.search import SearchIndex, PackedSearchIndex
+from utils.geo import GeoIndex
+from utils.tappay import (TapPayClient, TapPayError, TapPayUnknownError, SANDBOX_URL, SANDBOX_RECORD_URL,
+                          RECORD_CHARGED, RECORD_PENDING)
+from utils.jobs import JobQueue
+from utils.password import PasswordHasher
+from utils.response_cache import ResponseCache, dumps
+from utils.shared_cache import SharedSnapshot
+from utils.static import StaticAssets
+from utils.metrics import Metrics, MetricsMiddleware
+from utils.log import setup_logging, stop_logging
 import os
+import asyncio
+import base64
+import hmac
+import threading
+import logging
 from pydantic import BaseModel
-import traceback
-from datetime import date as _date
-import requests
 from uuid import uuid4
 
 
 app = FastAPI()
 load_dotenv()
+setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger("app")
+
+# 每個請求的 SQL 指紋、筆數、取連線與執行時間、TapPay 時間；/metrics 輸出 Prometheus 格式
+metrics = Metrics(
+    slow_query_ms=float(os.getenv("SLOW_QUERY_MS", "200")),
+    slow_request_ms=float(os.getenv("SLOW_REQUEST_MS", "1000"))
+)
+app.add_middleware(MetricsMiddleware, metrics=metrics,
+                   server_timing=os.getenv("SERVER_TIMING", "1") == "1")
 TAPPAY_PARTNER_KEY = os.getenv("TAPPAY_PARTNER_KEY")
 TAPPAY_MERCHANT_ID = os.getenv("TAPPAY_MERCHANT_ID")
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+tappay = TapPayClient(
+    TAPPAY_PARTNER_KEY,
+    TAPPAY_MERCHANT_ID,
+    url=os.getenv("TAPPAY_URL", SANDBOX_URL),
+    record_url=os.getenv("TAPPAY_RECORD_URL", SANDBOX_RECORD_URL),
+    max_connections=int(os.getenv("TAPPAY_MAX_CONNECTIONS", "20")),
+    max_concurrency=int(os.getenv("TAPPAY_MAX_CONCURRENCY", "20")),
+    connect_timeout=float(os.getenv("TAPPAY_CONNECT_TIMEOUT", "5")),
+    read_timeout=float(os.getenv("TAPPAY_READ_TIMEOUT", "15")),
+    retries=int(os.getenv("TAPPAY_RETRIES", "2")),
+    metrics=metrics
+)
+
+password_hasher = PasswordHasher(
+    n=int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14))),
+    r=int(os.getenv("PASSWORD_SCRYPT_R", "8")),
+    p=int(os.getenv("PASSWORD_SCRYPT_P", "1")),
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "4")),
+    use_processes=os.getenv("PASSWORD_HASH_PROCESSES", "0") == "1"
+)
+
+# process_order 定義在下方，用 lambda 延後查找
+order_queue = JobQueue(
+    lambda job: process_order(job),
+    workers=int(os.getenv("ORDER_WORKERS", "4")),
+    maxsize=int(os.getenv("ORDER_QUEUE_SIZE", "100"))
+)
+
+# STATIC_IN_MEMORY=1：啟動時把 ./static 讀進記憶體並預先壓縮（gzip/brotli），HTML 直接從記憶體回傳
+if os.getenv("STATIC_IN_MEMORY", "1") == "1":
+    static_assets = StaticAssets("static")
+    app.mount("/static", static_assets, name="static")
+else:
+    static_assets = None
+    app.mount("/static", StaticFiles(directory="static"), name="static")
 
 auth_scheme = HTTPBearer()
 
+class AuthError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+
+@app.exception_handler(AuthError)
+async def auth_error_handler(request: Request, exc: AuthError):
+    return JSONResponse(status_code=403, content={"error": True, "message": exc.message})
+
+def require_member(message: str = "未登入系統，拒絕存取"):
+    # 驗證 Bearer token 並回傳 payload；token 驗證結果由 verify_access_token 快取
+    async def dependency(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
+        payload = verify_access_token(credentials.credentials)
+        if not payload:
+            raise AuthError(message)
+        return payload
+    return dependency
+
+member_required = require_member()
+favorite_member_required = require_member("未登入系統，無法查看喜愛景點")
+
 
 DB_CONFIG = {
     "host": os.getenv("DB_HOST"),
@@ -32,10 +110,122 @@ DB_CONFIG = {
     "database": os.getenv("DB_NAME")
 }
 
-DB_HOST = os.getenv("DB_HOST")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_NAME = os.getenv("DB_NAME")
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    size=int(os.getenv("DB_POOL_SIZE", "5")),
+    max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    recycle=int(os.getenv("DB_POOL_RECYCLE", "3600")),
+    pre_ping=os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    metrics=metrics
+)
+
+# DB_REPLICA_HOSTS=host1,host2:3307：景點目錄的唯讀查詢分流到 replica（帳密、資料庫與 primary 相同）
+# 購物車、訂單、收藏等會員資料一律讀 primary：剛寫入就讀時可能落在另一個 worker，per-process 的 pin 擋不住 replica 延遲
+def replica_config(address: str):
+    host, _, port = address.strip().partition(":")
+    config = {**DB_CONFIG, "host": host}
+    if port:
+        config["port"] = int(port)
+    return config
+
+db_replicas = [
+    ConnectionPool(
+        replica_config(address),
+        size=db_pool.size,
+        max_overflow=db_pool.max_overflow,
+        timeout=float(os.getenv("DB_REPLICA_TIMEOUT", "2")),
+        recycle=db_pool.recycle,
+        pre_ping=db_pool.pre_ping,
+        metrics=metrics
+    )
+    for address in os.getenv("DB_REPLICA_HOSTS", "").split(",") if address.strip()
+]
+db_router = ReplicaRouter(
+    db_pool,
+    db_replicas,
+    strategy=os.getenv("DB_REPLICA_STRATEGY", "round_robin"),
+    cooldown=float(os.getenv("DB_REPLICA_COOLDOWN", "10"))
+)
+run_db = DBRunner(sum(pool.size + pool.max_overflow for pool in [db_pool, *db_replicas]))
+
+# 景點資料幾乎不會變動，快取組好的 dict；資料更新時呼叫 invalidate_attraction_cache()
+attraction_cache = TTLCache(
+    maxsize=int(os.getenv("ATTRACTION_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("ATTRACTION_CACHE_TTL", "3600"))
+)
+attraction_summary_cache = TTLCache(
+    maxsize=int(os.getenv("ATTRACTION_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("ATTRACTION_CACHE_TTL", "3600"))
+)
+
+# 景點相關 API 的 JSON 回應（已編碼的 bytes + ETag），景點資料更新時 bump() 全部失效
+# 沒有設定 CATALOG_SNAPSHOT_DIR 時，/api/catalog/refresh（含 ETL --notify）只會清掉收到請求的那個 worker，
+# 其他 worker 靠 RESPONSE_CACHE_TTL 過期；多 worker 部署要立即生效請開啟共用快照
+response_cache = ResponseCache(
+    max_bytes=int(os.getenv("RESPONSE_CACHE_BYTES", str(16 * 1024 * 1024))),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+)
+
+# 登入用的會員快取；查無此人的 email 只快取很短的時間
+member_cache = TTLCache(
+    maxsize=int(os.getenv("MEMBER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("MEMBER_CACHE_TTL", "300"))
+)
+MEMBER_NEGATIVE_TTL = float(os.getenv("MEMBER_NEGATIVE_TTL", "10"))
+
+# 每個會員的收藏景點 id（dict 當有序集合，依收藏先後），寫入時同步更新；同一會員的寫入與快取填入用分段鎖排隊
+# 快取是每個 worker 各一份，別的 worker 寫入後這裡最多舊 FAVORITE_CACHE_TTL 秒，所以 TTL 設得短
+favorite_cache = TTLCache(
+    maxsize=int(os.getenv("FAVORITE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("FAVORITE_CACHE_TTL", "5"))
+)
+favorite_locks = [threading.Lock() for _ in range(64)]
+FAVORITE_CONTAINS_MAX_IDS = 100
+
+# /api/attractions?ids=1,2,3&fields=name,address,image：一次取回多筆景點，fields 只含摘要欄位時不撈圖片清單與介紹
+ATTRACTIONS_BULK_MAX_IDS = 100
+ATTRACTION_FIELDS = ("id", "name", "category", "description", "address", "transport", "mrt", "lat", "lng", "images", "image")
+SUMMARY_FIELDS = {"id", "name", "address", "image"}
+
+# 關鍵字搜尋用的 n-gram 索引，第一次搜尋時從 attractions 表建立
+search_index = None
+search_index_lock = threading.Lock()
+
+# 附近景點用的 KD-tree，第一次查詢時從 attractions 的 lat/lng 建立
+geo_index = None
+geo_index_lock = threading.Lock()
+NEARBY_MAX_LIMIT = 50
+
+# /api/mrts 的捷運站統計，啟動時或景點資料更新時計算
+mrt_facet = None
+CATALOG_REFRESH_TOKEN = os.getenv("CATALOG_REFRESH_TOKEN")
+# /api/stats 與 /metrics 都含連線池、佇列與 SQL 指紋等內部資訊，要帶 STATS_TOKEN：
+# X-Stats-Token 標頭，或 Authorization: Bearer <token>（Prometheus scrape 設定的 authorization）；沒設定時一律拒絕
+STATS_TOKEN = os.getenv("STATS_TOKEN")
+
+# CATALOG_SNAPSHOT_DIR：同一台機器上的 worker 共用一份景點目錄快照（建議放在 /dev/shm 這類 tmpfs）
+# 第一個啟動的 worker 建立快照；景點資料更新時重建並遞增版本號，其他 worker 讀取前發現版本變了就清掉本機快取
+CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR")
+catalog_snapshot = SharedSnapshot(CATALOG_SNAPSHOT_DIR) if CATALOG_SNAPSHOT_DIR else None
+catalog_sync_lock = threading.Lock()
+
+# orders.status：1 已付款、2 付款處理中、3 付款失敗、4 扣款結果不明待對帳；購物車另存在 cart 表，每個會員一列
+# 待對帳的訂單不放回購物車，等 TapPay 查得到結果才改成已付款或失敗，避免會員重新結帳被扣兩次
+ORDER_STATUS_PAID = 1
+ORDER_STATUS_PROCESSING = 2
+ORDER_STATUS_FAILED = 3
+ORDER_STATUS_UNKNOWN = 4
+
+# ORDER_PROCESSING=async 時 /api/orders 只建立訂單，付款由背景 worker 處理
+ORDER_PROCESSING = os.getenv("ORDER_PROCESSING", "sync")
+ORDER_PAYMENT_TIMEOUT = float(os.getenv("ORDER_PAYMENT_TIMEOUT", "30"))
+# 關閉時最多等 ORDER_DRAIN_TIMEOUT 秒讓佇列裡的付款做完
+ORDER_DRAIN_TIMEOUT = float(os.getenv("ORDER_DRAIN_TIMEOUT", "30"))
+# 處理中超過 ORDER_STALE_SECONDS 秒的訂單視為負責的 worker 已經不在（重啟、當機），每 ORDER_SWEEP_INTERVAL 秒檢查一次
+ORDER_STALE_SECONDS = float(os.getenv("ORDER_STALE_SECONDS", str(ORDER_PAYMENT_TIMEOUT * 4)))
+ORDER_SWEEP_INTERVAL = float(os.getenv("ORDER_SWEEP_INTERVAL", "60"))
+order_sweeper = None
 
 class SignupForm(BaseModel):
     name: str
@@ -68,81 +258,187 @@ class OrderForm(BaseModel):
     prime: str
     order: InnerOrder
 
-conn = mysql.connector.connect(
-    host=DB_HOST,
-    user=DB_USER,
-    password=DB_PASSWORD,
-    database=DB_NAME
-)
+@app.on_event("startup")
+async def start_order_queue():
+    global order_sweeper
+    if ORDER_PROCESSING == "async":
+        order_queue.start()
+    order_sweeper = asyncio.create_task(sweep_stale_orders())
+
+@app.on_event("startup")
+def warm_catalog():
+    try:
+        if catalog_snapshot is not None:
+            catalog_snapshot.ensure(read_catalog)
+            response_cache.bump(catalog_snapshot.version)
+        load_mrt_facet()
+    except Exception:
+        # 資料庫還沒準備好時不擋啟動，第一次請求再計算
+        logger.exception("failed to warm the catalog")
+
+@app.on_event("shutdown")
+async def close_clients():
+    if order_queue.running:
+        await order_queue.stop(ORDER_DRAIN_TIMEOUT)
+    if order_sweeper is not None:
+        order_sweeper.cancel()
+        await asyncio.gather(order_sweeper, return_exceptions=True)
+    await tappay.aclose()
+    password_hasher.shutdown()
+    run_db.shutdown()
+    db_pool.dispose()
+    db_router.dispose()
+    stop_logging()
+
+def stats_authorized(request: Request):
+    token = request.headers.get("X-Stats-Token")
+    if token is None:
+        scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else ""
+    return bool(STATS_TOKEN) and hmac.compare_digest(token.encode(), STATS_TOKEN.encode())
+
+@app.get("/api/stats", include_in_schema=False)
+def stats_api(request: Request):
+    if not stats_authorized(request):
+        return JSONResponse(status_code=403, content={"error": True, "message": "拒絕存取"})
+
+    return {
+        "db_pool": db_pool.stats(),
+        "db_router": db_router.stats(),
+        "attraction_cache": attraction_cache.stats(),
+        "tappay": tappay.stats(),
+        "order_queue": order_queue.stats(),
+        "token_cache": token_cache_stats(),
+        "member_cache": member_cache.stats(),
+        "favorite_cache": favorite_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "catalog_snapshot": catalog_snapshot.stats() if catalog_snapshot is not None else None,
+        "slow_queries": metrics.slow_queries(),
+        "top_queries": metrics.top_queries()
+    }
+
+metrics.add_gauges("db_pool", db_pool.stats)
+metrics.add_gauges("order_queue", order_queue.stats)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_api(request: Request):
+    if not stats_authorized(request):
+        return PlainTextResponse("forbidden\n", status_code=403)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def html_page(request: Request, name: str):
+    if static_assets:
+        return static_assets.page(request, name)
+    return FileResponse(f"./static/{name}", media_type="text/html")
 
 # Static Pages (Never Modify Code in this Block)
 @app.get("/", include_in_schema=False)
 async def index(request: Request):
-    return FileResponse("./static/index.html", media_type="text/html")
+    return html_page(request, "index.html")
 
 @app.get("/attraction/{id}", include_in_schema=False)
 async def attraction(request: Request, id: int):
-    return FileResponse("./static/attraction.html", media_type="text/html")
+    return html_page(request, "attraction.html")
 
 @app.get("/booking", include_in_schema=False)
 async def booking(request: Request):
-    return FileResponse("./static/booking.html", media_type="text/html")
+    return html_page(request, "booking.html")
 
 @app.get("/thankyou", include_in_schema=False)
 async def thankyou(request: Request):
-    return FileResponse("./static/thankyou.html", media_type="text/html")
+    return html_page(request, "thankyou.html")
 
 @app.get("/member", include_in_schema=False)
 async def member(request: Request):
-    return FileResponse("./static/member.html", media_type="text/html")
+    return html_page(request, "member.html")
 
 def get_member_by_email(email: str):
-    query = "SELECT * FROM member WHERE username = %s"
-    with mysql.connector.connect(**DB_CONFIG) as conn:
+    # 查不到的 email 也快取（存 False），擋住重複嘗試登入的流量
+    cached = member_cache.get(email)
+    if cached is not None:
+        return cached or None
+
+    query = "SELECT id, name, username, password FROM member WHERE username = %s"
+    with db_pool.connection() as conn:
         with conn.cursor(dictionary=True) as cursor:
             cursor.execute(query, (email,))
-            return cursor.fetchone()
+            user = cursor.fetchone()
+
+    if user:
+        member_cache.set(email, user)
+    else:
+        member_cache.set(email, False, ttl=MEMBER_NEGATIVE_TTL)
+    return user
 
 def add_booking(price: int,
                 attraction_id: int,
                 member_id: int,
                 date: str,
-                time: str,
-                *,
-                status: int = 0):
-    delete_sql = """
-        DELETE FROM orders
-        WHERE member_id = %s AND status = 0
-    """
-
-    insert_sql = """
-        INSERT INTO orders
-            (price, attraction_id, member_id, date, time, status)
+                time: str):
+    # 購物車一個會員一列（cart.member_id 為主鍵），新行程直接覆蓋，同時送出的請求也只會留下一列
+    upsert_sql = """
+        INSERT INTO cart
+            (member_id, attraction_id, date, time, price)
         VALUES
-            (%s,    %s,            %s,        %s,   %s,   %s)
+            (%s,        %s,            %s,   %s,   %s)
+        ON DUPLICATE KEY UPDATE
+            attraction_id = VALUES(attraction_id), date = VALUES(date),
+            time = VALUES(time), price = VALUES(price)
     """
-    params = (price, attraction_id, member_id, date, time, status)
+    params = (member_id, attraction_id, date, time, price)
 
-    with mysql.connector.connect(**DB_CONFIG) as conn:
+    with db_pool.connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(delete_sql, (member_id,)) #刪舊的
-            cur.execute(insert_sql, params) #加新的
+            cur.execute(upsert_sql, params)
             conn.commit()
 
+def get_favorite_ids(member_id: int):
+    # 回傳 {attraction_id: None}，依收藏先後排序；只讀 (member_id, attraction_id) 索引
+    cached = favorite_cache.get(member_id)
+    if cached is not None:
+        return cached
+
+    # 和 add/remove_favorite 用同一把鎖：SELECT 到寫入快取之間不會有這個 worker 的寫入插進來被蓋掉
+    with favorite_locks[member_id % len(favorite_locks)]:
+        cached = favorite_cache.get(member_id)
+        if cached is not None:
+            return cached
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT attraction_id FROM favorite WHERE member_id = %s ORDER BY id", (member_id,))
+                ids = dict.fromkeys(row[0] for row in cur.fetchall())
+        favorite_cache.set(member_id, ids)
+    return ids
+
+def update_favorite_cache(member_id: int, attraction_id: int, added: bool):
+    # 快取裡的 dict 可能正被其他請求讀取，複製一份再換掉
+    cached = favorite_cache.get(member_id)
+    if cached is None:
+        return
+    ids = dict(cached)
+    if added:
+        ids.setdefault(attraction_id, None)
+    else:
+        ids.pop(attraction_id, None)
+    favorite_cache.set(member_id, ids)
+
 def add_favorite(attraction_id: int,
                 member_id: int):
+    # favorite 有 (member_id, attraction_id) 唯一索引，重複收藏直接略過
     insert_sql = """
-        INSERT INTO favorite
+        INSERT IGNORE INTO favorite
             (attraction_id, member_id)
         VALUES
             (%s,            %s)
     """
     params = (attraction_id, member_id)
 
-    with mysql.connector.connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
-            cur.execute(insert_sql, params) #加新的
-            conn.commit()
+    with favorite_locks[member_id % len(favorite_locks)]:
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(insert_sql, params) #加新的
+                conn.commit()
+        update_favorite_cache(member_id, attraction_id, added=True)
 
 def remove_favorite(attraction_id: int,
                 member_id: int):
@@ -151,34 +447,41 @@ def remove_favorite(attraction_id: int,
     """
     params = (attraction_id, member_id)
 
-    with mysql.connector.connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
-            cur.execute(delete_sql, params)
-            conn.commit()
+    with favorite_locks[member_id % len(favorite_locks)]:
+        with db_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(delete_sql, params)
+                conn.commit()
+        update_favorite_cache(member_id, attraction_id, added=False)
 
 def get_favorite_list(member_id):
-    query = """
-    SELECT a.id, a.name, a.category, a.description, a.address, a.mrt, GROUP_CONCAT(i.image_url) AS images
-    FROM favorite f
-    JOIN attractions a ON f.attraction_id = a.id
-    LEFT JOIN images i ON a.id = i.attraction_id
-    WHERE f.member_id = %s
-    GROUP BY a.id
-    """
-    with mysql.connector.connect(**DB_CONFIG) as conn:
-        with conn.cursor(dictionary=True) as cursor:
-            cursor.execute(query, (member_id,))
-            rows = cursor.fetchall()
-            return rows
+    # 收藏 id 來自 favorite_cache，景點內容來自 attraction_cache，不用每次 JOIN
+    ids = get_favorite_ids(member_id)
+    attractions = get_attractions_by_ids(list(ids))
+    rows = []
+    for attraction_id in ids:
+        attraction = attractions.get(attraction_id)
+        if attraction is None:
+            continue
+        rows.append({
+            "id": attraction["id"],
+            "name": attraction["name"],
+            "category": attraction["category"],
+            "description": attraction["description"],
+            "address": attraction["address"],
+            "mrt": attraction["mrt"],
+            "images": attraction["images"][0] if attraction["images"] else ""
+        })
+    return rows
 
 def get_booking_list(member_id):
     query = """
     SELECT attraction_id, date, time, price
-    FROM orders
-    WHERE member_id = %s AND number IS NULL
+    FROM cart
+    WHERE member_id = %s
     """
 
-    with mysql.connector.connect(**DB_CONFIG) as conn:
+    with db_pool.connection() as conn:
         with conn.cursor(dictionary=True) as cursor:
             cursor.execute(query, (member_id,))
             return cursor.fetchone()
@@ -188,184 +491,618 @@ def get_booking_list_all(member_id):
     SELECT number, attraction_id, date, time, price, name, email, phone, status
     FROM orders
     WHERE member_id = %s AND status = 1
+    ORDER BY order_time
     """
 
-    with mysql.connector.connect(**DB_CONFIG) as conn:
+    with db_pool.connection() as conn:
         with conn.cursor(dictionary=True) as cursor:
             cursor.execute(query, (member_id,))
             return cursor.fetchall()
 
 def delete_booking(member_id):
+    # 只清購物車，已成立的訂單不動；回傳是否真的有購物車被刪除
     query = """
-    DELETE FROM orders
+    DELETE FROM cart
     WHERE member_id = %s"""
 
-    with mysql.connector.connect(**DB_CONFIG) as conn:
+    with db_pool.connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(query, (member_id,))
             conn.commit()
+            deleted = cursor.rowcount > 0
+    return deleted
 
 def complete_order(number, name, email, phone, member_id, status):
-    print("[DEBUG] 執行 UPDATE SQL：", number, name, email, phone, member_id, status)
-    with mysql.connector.connect(**DB_CONFIG) as conn:
+    # 鎖住購物車那一列再轉成訂單，同一會員同時結帳時只有一個請求拿得到購物車
+    # 回傳購物車裡的 price 與 attraction_id，扣款金額以這裡為準，不用前端送來的值；沒有購物車時回傳 None
+    with db_pool.connection() as conn:
+        conn.start_transaction()
         with conn.cursor() as cursor:
             cursor.execute("""
-            SELECT id FROM orders
-            WHERE member_id = %s AND number IS NULL
-            ORDER BY order_time DESC
-            LIMIT 1 """, (member_id,))
+            SELECT price, attraction_id, date, time FROM cart
+            WHERE member_id = %s
+            FOR UPDATE""", (member_id,))
             row = cursor.fetchone()
             if not row:
-                print("[DEBUG]沒找到可更新的訂單")
-                return
-            
-            order_id = row[0]
-            print(order_id)
+                conn.rollback()
+                logger.info("no cart to turn into order %s for member %s", number, member_id)
+                return None
 
+            price, attraction_id, date, time = row
             cursor.execute("""
-            UPDATE orders
-            SET number = %s, name = %s, email = %s, phone = %s, status = %s
-            WHERE id = %s
-            """, (number, name, email, phone, status, order_id))
+            INSERT INTO orders
+                (number, price, attraction_id, member_id, date, time, name, email, phone, status)
+            VALUES
+                (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (number, price, attraction_id, member_id, date, time, name, email, phone, status))
+            cursor.execute("DELETE FROM cart WHERE member_id = %s", (member_id,))
             conn.commit()
-            print("[Debug]訂單已更新id=", order_id)
+    logger.debug("order %s created from cart of member %s with status %s", number, member_id, status)
+    return {"price": price, "attraction_id": attraction_id}
 
-def get_order_by_number(order_number):
+def set_order_status(number, status, current=None):
+    # 有 current 時只改狀態還是 current 的訂單，回傳是否真的改到
+    with db_pool.connection() as conn:
+        with conn.cursor() as cursor:
+            if current is None:
+                cursor.execute("UPDATE orders SET status = %s WHERE number = %s", (status, number))
+            else:
+                cursor.execute(
+                    "UPDATE orders SET status = %s WHERE number = %s AND status = %s",
+                    (status, number, current)
+                )
+            conn.commit()
+            return cursor.rowcount == 1
+
+def hold_order(number):
+    # 扣款結果不明：改成待對帳，購物車維持鎖在訂單上，不放回
+    held = set_order_status(number, ORDER_STATUS_UNKNOWN, current=ORDER_STATUS_PROCESSING)
+    if held:
+        logger.warning("payment result of order %s is unknown, waiting for reconciliation", number)
+    return held
+
+def fail_order(number, current=ORDER_STATUS_PROCESSING):
+    # 付款失敗：保留失敗紀錄，並在會員沒有新購物車時把行程放回購物車（已有購物車時 INSERT IGNORE 略過）
+    # 只改狀態還是 current 的訂單，重複呼叫（例如 worker 與逾時清理同時進來）不會重複放回購物車
+    with db_pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "UPDATE orders SET status = %s WHERE number = %s AND status = %s",
+                (ORDER_STATUS_FAILED, number, current)
+            )
+            if cursor.rowcount != 1:
+                conn.rollback()
+                return False
+            cursor.execute("""
+            INSERT IGNORE INTO cart (member_id, attraction_id, date, time, price)
+            SELECT member_id, attraction_id, date, time, price
+            FROM orders
+            WHERE number = %s
+            """, (number,))
+            conn.commit()
+    return True
+
+def hold_stale_orders(max_age: float):
+    # 卡在處理中的訂單：負責的 worker 已經不在，不知道請求有沒有送到 TapPay，改成待對帳交給 reconcile_orders
+    with db_pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            SELECT number FROM orders
+            WHERE status = %s AND order_time < NOW() - INTERVAL %s SECOND
+            """, (ORDER_STATUS_PROCESSING, int(max_age)))
+            stale = cursor.fetchall()
+        conn.rollback()
+
+    held = [number for (number,) in stale if hold_order(number)]
+    if held:
+        logger.warning("held %d orders stuck in processing: %s", len(held), ", ".join(held))
+    return held
+
+def get_unknown_orders(min_age: float, limit: int = 100):
+    # 剛送出的請求 TapPay 可能還沒寫入紀錄，至少等 min_age 秒再查，查不到才能確定沒有扣款
+    with db_pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            SELECT number FROM orders
+            WHERE status = %s AND order_time < NOW() - INTERVAL %s SECOND
+            ORDER BY order_time
+            LIMIT %s
+            """, (ORDER_STATUS_UNKNOWN, int(min_age), limit))
+            numbers = [number for (number,) in cursor.fetchall()]
+        conn.rollback()
+    return numbers
+
+async def reconcile_order(number):
+    # 用訂單編號向 TapPay 查扣款紀錄：有扣款就是已付款，沒有紀錄或已取消就失敗並放回購物車，銀行處理中就下次再查
+    try:
+        record = await tappay.find_payment(number)
+    except TapPayError:
+        logger.exception("failed to look up the payment of order %s", number)
+        return None
+    if record is not None and record.get("record_status") in RECORD_PENDING:
+        return None
+    if record is not None and record.get("record_status") in RECORD_CHARGED:
+        await run_db(set_order_status, number, ORDER_STATUS_PAID, ORDER_STATUS_UNKNOWN)
+        logger.info("order %s reconciled as paid (rec_trade_id %s)", number, record.get("rec_trade_id"))
+        return ORDER_STATUS_PAID
+    await run_db(fail_order, number, ORDER_STATUS_UNKNOWN)
+    logger.info("order %s reconciled as failed", number)
+    return ORDER_STATUS_FAILED
+
+async def reconcile_orders():
+    numbers = await run_db(get_unknown_orders, ORDER_PAYMENT_TIMEOUT)
+    for number in numbers:
+        await reconcile_order(number)
+    return numbers
+
+async def sweep_stale_orders():
+    while True:
+        try:
+            await run_db(hold_stale_orders, ORDER_STALE_SECONDS)
+            await reconcile_orders()
+        except Exception:
+            logger.exception("failed to sweep stale orders")
+        await asyncio.sleep(ORDER_SWEEP_INTERVAL)
+
+def get_order_by_number(order_number, member_id):
     query = """
-    SELECT * FROM orders WHERE number = %s
+    SELECT * FROM orders WHERE number = %s AND member_id = %s
     """
-    with mysql.connector.connect(**DB_CONFIG) as conn:
+    with db_pool.connection() as conn:
         with conn.cursor(dictionary=True) as cursor:
-            cursor.execute(query, (order_number,))
+            cursor.execute(query, (order_number, member_id))
             return cursor.fetchone()
 
-def get_attractions_list(page: int = 0, keyword: str = None):
+ATTRACTION_COLUMNS = """
+    a.id, a.name, a.category, a.description, a.address,
+    a.transport, a.mrt, a.lat, a.lng, a.cover_image
+"""
+
+def fetch_images(cursor, attraction_ids):
+    # 依 position 排好的圖片清單；不用 GROUP_CONCAT，不受 group_concat_max_len 限制
+    images = {attraction_id: [] for attraction_id in attraction_ids}
+    if not images:
+        return images
+
+    placeholders = ", ".join(["%s"] * len(images))
+    cursor.execute(f"""
+    SELECT attraction_id, image_url
+    FROM images
+    WHERE attraction_id IN ({placeholders})
+    ORDER BY attraction_id, position
+    """, list(images))
+    for row in cursor.fetchall():
+        images[row["attraction_id"]].append(row["image_url"])
+    return images
+
+def build_attraction(row, images_list):
+    mrt_value = row["mrt"] if row["mrt"] else ""
+
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "category": row["category"],
+        "description": row["description"],
+        "address": row["address"],
+        "transport": row["transport"],
+        "mrt": mrt_value,
+        "lat": float(row["lat"]),
+        "lng": float(row["lng"]),
+        "images": images_list
+    }
+
+def build_summary(row):
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "address": row["address"],
+        "image": row["cover_image"]
+    }
+
+def encode_cursor(kind: str, value: int):
+    return base64.urlsafe_b64encode(f"{kind}:{value}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, kind: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_kind, value = base64.urlsafe_b64decode(padded).decode().split(":", 1)
+        if cursor_kind != kind:
+            raise ValueError(cursor_kind)
+        # 位移和 id 都不會是負數；負的位移會切出空頁，當成格式錯誤
+        value = int(value)
+        if value < 0:
+            raise ValueError(value)
+        return value
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+
+def get_search_index():
+    global search_index
+    if search_index is None:
+        with search_index_lock:
+            if search_index is None:
+                # 有共用快照時直接在 mmap 上查 read_catalog 打包好的索引，不在每個 worker 各建一份
+                snapshot = loaded_snapshot()
+                if snapshot is not None and snapshot.blob("search") is not None:
+                    search_index = PackedSearchIndex(snapshot.blob("search"))
+                    return search_index
+                query = "SELECT id, name, category, description, address, mrt FROM attractions"
+                with db_router.connection(read_only=True) as conn:
+                    with conn.cursor(dictionary=True) as cursor:
+                        cursor.execute(query)
+                        rows = cursor.fetchall()
+                search_index = SearchIndex(rows)
+    return search_index
+
+def reset_search_index():
+    global search_index
+    with search_index_lock:
+        search_index = None
+
+def get_geo_index():
+    global geo_index
+    if geo_index is None:
+        with geo_index_lock:
+            if geo_index is None:
+                snapshot = loaded_snapshot()
+                if snapshot is not None and snapshot.blob("geo") is not None:
+                    geo_index = GeoIndex.from_buffer(snapshot.blob("geo"))
+                    return geo_index
+                with db_router.connection(read_only=True) as conn:
+                    with conn.cursor(dictionary=True) as cursor:
+                        cursor.execute("SELECT id, lat, lng FROM attractions")
+                        rows = cursor.fetchall()
+                geo_index = GeoIndex(rows)
+    return geo_index
+
+def reset_geo_index():
+    global geo_index
+    with geo_index_lock:
+        geo_index = None
+
+def get_nearby_attractions(lat: float, lng: float, radius: float = None, limit: int = 12):
+    # 有 radius 時只回傳範圍內的景點，兩種都依距離由近到遠、最多 limit 筆
+    nearest = get_geo_index().nearest(lat, lng, k=limit, radius=radius)
+    attractions = get_attractions_by_ids([attraction_id for attraction_id, _ in nearest])
+    results = []
+    for attraction_id, distance in nearest:
+        attraction = attractions.get(attraction_id)
+        if attraction is not None:
+            results.append({**attraction, "distance": round(distance, 1)})
+    return results
+
+def search_attractions(keyword: str, page: int = 0, cursor: str = None):
     limit = 12
-    offset = page * limit
+    offset = decode_cursor(cursor, "o") if cursor else page * limit
 
-    query = """
-    SELECT
-        a.id, a.name, a.category, a.description, a.address,
-        a.transport, a.mrt, a.lat, a.lng,
-        COALESCE(GROUP_CONCAT(i.image_url SEPARATOR ','), '') AS images
-    FROM attractions a
-    LEFT JOIN images i ON a.id = i.attraction_id
-    """
+    ranked_ids = get_search_index().search(keyword)
+    page_ids = ranked_ids[offset:offset + limit]
+    attractions = get_attractions_by_ids(page_ids)
+    results = [attractions[i] for i in page_ids if i in attractions]
 
-    conditions = []
-    params = []
+    if offset + limit < len(ranked_ids):
+        return results, page + 1, encode_cursor("o", offset + limit)
+    return results, None, None
 
+def get_attractions_list(page: int = 0, keyword: str = None, cursor: str = None):
     if keyword:
-        conditions.append("(a.name LIKE %s OR a.mrt = %s)")
-        params.extend([f"%{keyword}%", keyword])
+        return search_attractions(keyword, page, cursor)
 
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
+    limit = 12
 
-    query += " GROUP BY a.id ORDER BY a.id LIMIT %s OFFSET %s"
-    params.extend([limit + 1, offset])
+    # 先在 attractions 上用主鍵挑出這一頁的 id，圖片再依 id 另外查
+    if cursor:
+        page_query = "SELECT id FROM attractions WHERE id > %s ORDER BY id LIMIT %s"
+        params = [decode_cursor(cursor, "id"), limit + 1]
+    else:
+        page_query = "SELECT id FROM attractions ORDER BY id LIMIT %s OFFSET %s"
+        params = [limit + 1, page * limit]
+
+    query = f"""
+    SELECT {ATTRACTION_COLUMNS}
+    FROM ({page_query}) p
+    JOIN attractions a ON a.id = p.id
+    ORDER BY a.id
+    """
 
-    with mysql.connector.connect(**DB_CONFIG) as conn:
-        with conn.cursor(dictionary=True) as cursor:
-            cursor.execute(query, params or ())
-            rows = cursor.fetchall()
+    with db_router.connection(read_only=True) as conn:
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            images = fetch_images(cur, [row["id"] for row in rows])
 
+    # 有共用快照時單筆查詢都走快照，這裡不用再存本機快取
+    cache_locally = loaded_snapshot() is None
     results = []
     for row in rows:
-        images_list = row["images"].split(",") if row["images"] else []
-        mrt_value = row["mrt"] if row["mrt"] else ""
-
-        results.append({
-            "id": row["id"],
-            "name": row["name"],
-            "category": row["category"],
-            "description": row["description"],
-            "address": row["address"],
-            "transport": row["transport"],
-            "mrt": mrt_value,
-            "lat": float(row["lat"]),
-            "lng": float(row["lng"]),
-            "images": images_list
-        })
+        attraction = build_attraction(row, images[row["id"]])
+        if cache_locally:
+            attraction_cache.set(attraction["id"], attraction)
+        results.append(attraction)
 
     if len(results) > limit:
-        next_page = page + 1
         results = results[:limit]
+        next_page = page + 1
+        next_cursor = encode_cursor("id", results[-1]["id"])
     else:
         next_page = None
+        next_cursor = None
 
-    return results, next_page
+    return results, next_page, next_cursor
 
 
 def get_single_attraction(attraction_id: int):
-    query = """
-    SELECT
-        a.id, a.name, a.category, a.description, a.address,
-        a.transport, a.mrt, a.lat, a.lng,
-        COALESCE(GROUP_CONCAT(i.image_url SEPARATOR ','), '') AS images
-    FROM attractions a
-    LEFT JOIN images i ON a.id = i.attraction_id
-    WHERE a.id = %s
-    GROUP BY a.id
-    """
+    # 有共用快照時每次從 mmap 解碼，不另存一份到本機快取；本機快取只放快照以外、查資料庫得到的景點
+    snapshot = loaded_snapshot()
+    record = snapshot.get(attraction_id) if snapshot is not None else None
+    if record is not None:
+        return record["attraction"]
+
+    cached = attraction_cache.get(attraction_id)
+    if cached is not None:
+        return cached
 
-    with mysql.connector.connect(**DB_CONFIG) as conn:
+    query = f"SELECT {ATTRACTION_COLUMNS} FROM attractions a WHERE a.id = %s"
+
+    with db_router.connection(read_only=True) as conn:
         with conn.cursor(dictionary=True) as cursor:
             cursor.execute(query, (attraction_id,))
             row = cursor.fetchone()
+            if not row:
+                return None
+            images = fetch_images(cursor, [attraction_id])
+
+    attraction = build_attraction(row, images[attraction_id])
+    attraction_cache.set(attraction_id, attraction)
+    return attraction
+
+
+def get_attractions_by_ids(attraction_ids):
+    # 先查共用快照（直接回傳解碼結果，不複製到本機快取），再查本機快取，都沒命中的 id 用一次 IN 查詢補齊
+    sync_catalog()
+    found = {}
+    missing = list(dict.fromkeys(attraction_ids))
+
+    snapshot = loaded_snapshot()
+    if snapshot is not None:
+        for attraction_id, record in snapshot.get_many(missing).items():
+            found[attraction_id] = record["attraction"]
+        missing = [attraction_id for attraction_id in missing if attraction_id not in found]
+
+    uncached = []
+    for attraction_id in missing:
+        cached = attraction_cache.get(attraction_id)
+        if cached is not None:
+            found[attraction_id] = cached
+        else:
+            uncached.append(attraction_id)
+    missing = uncached
+
+    if not missing:
+        return found
+
+    placeholders = ", ".join(["%s"] * len(missing))
+    query = f"SELECT {ATTRACTION_COLUMNS} FROM attractions a WHERE a.id IN ({placeholders})"
+
+    with db_router.connection(read_only=True) as conn:
+        with conn.cursor(dictionary=True) as cursor:
+            cursor.execute(query, missing)
+            rows = cursor.fetchall()
+            images = fetch_images(cursor, [row["id"] for row in rows])
 
-    if not row:
-        return None
+    for row in rows:
+        attraction = build_attraction(row, images[row["id"]])
+        attraction_cache.set(attraction["id"], attraction)
+        found[attraction["id"]] = attraction
 
-    images_list = row["images"].split(",") if row["images"] else []
-    mrt_value = row["mrt"] if row["mrt"] else ""
+    return found
 
-    return {
-        "id": row["id"],
-        "name": row["name"],
-        "category": row["category"],
-        "description": row["description"],
-        "address": row["address"],
-        "transport": row["transport"],
-        "mrt": mrt_value,
-        "lat": float(row["lat"]),
-        "lng": float(row["lng"]),
-        "images": images_list
-    }
 
+def get_attraction_summaries(attraction_ids):
+    # 預定、訂單頁只需要名稱、地址和封面圖，不用撈整份圖片清單；快照與本機快取的順序同 get_attractions_by_ids
+    sync_catalog()
+    found = {}
+    missing = list(dict.fromkeys(attraction_ids))
 
-def get_mrt_list():
-    query = """
-    SELECT a.mrt, COUNT(a.id) AS attraction_count
-    FROM attractions a
-    WHERE a.mrt IS NOT NULL
-    GROUP BY a.mrt
-    ORDER BY attraction_count DESC
-    """
+    snapshot = loaded_snapshot()
+    if snapshot is not None:
+        for attraction_id, record in snapshot.get_many(missing).items():
+            found[attraction_id] = record["summary"]
+        missing = [attraction_id for attraction_id in missing if attraction_id not in found]
+
+    uncached = []
+    for attraction_id in missing:
+        cached = attraction_summary_cache.get(attraction_id)
+        if cached is not None:
+            found[attraction_id] = cached
+        else:
+            uncached.append(attraction_id)
+    missing = uncached
+
+    if not missing:
+        return found
 
-    with mysql.connector.connect(**DB_CONFIG) as conn:
+    placeholders = ", ".join(["%s"] * len(missing))
+    query = f"SELECT id, name, address, cover_image FROM attractions WHERE id IN ({placeholders})"
+
+    with db_router.connection(read_only=True) as conn:
         with conn.cursor(dictionary=True) as cursor:
-            cursor.execute(query)
+            cursor.execute(query, missing)
             rows = cursor.fetchall()
 
-    mrt_list = [row["mrt"] for row in rows if row["mrt"]]
-    return mrt_list
+    for row in rows:
+        summary = build_summary(row)
+        attraction_summary_cache.set(row["id"], summary)
+        found[row["id"]] = summary
+
+    return found
+
+def get_attraction_summary(attraction_id: int):
+    return get_attraction_summaries([attraction_id]).get(attraction_id)
+
+def lookup_attractions(attraction_ids, fields=None):
+    # 依請求順序回傳找到的景點（重複的 id 只算一次），以及查無資料的 id
+    # fields 都在摘要欄位內時走 attraction_summary_cache；image 是第一張圖（即 cover_image）
+    attraction_ids = list(dict.fromkeys(attraction_ids))
+    if fields and SUMMARY_FIELDS.issuperset(fields):
+        found = get_attraction_summaries(attraction_ids)
+    else:
+        found = get_attractions_by_ids(attraction_ids)
+
+    results = []
+    missing = []
+    for attraction_id in attraction_ids:
+        attraction = found.get(attraction_id)
+        if attraction is None:
+            missing.append(attraction_id)
+        elif not fields:
+            results.append(attraction)
+        else:
+            if "image" not in attraction:
+                # 沒有圖片時和摘要（cover_image）、預定與訂單 API 一樣回傳 null
+                attraction = {**attraction, "image": attraction["images"][0] if attraction["images"] else None}
+            results.append({field: attraction[field] for field in fields})
+    return results, missing
+
+def parse_id_list(value: str):
+    # "1,2,3" -> [1, 2, 3]；格式不對時丟 ValueError
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def clear_local_catalog(attraction_id: int = None):
+    # 只清這個 process 的快取；不帶 id 時連索引和捷運站統計一起作廢
+    global mrt_facet
+    if attraction_id is None:
+        attraction_cache.clear()
+        attraction_summary_cache.clear()
+        reset_search_index()
+        reset_geo_index()
+        mrt_facet = None
+    else:
+        attraction_cache.invalidate(attraction_id)
+        attraction_summary_cache.invalidate(attraction_id)
+    # 列表頁也含有這筆景點，已編碼的回應全部作廢
+    response_cache.bump(catalog_snapshot.version if catalog_snapshot is not None else None)
+
+
+def invalidate_attraction_cache(attraction_id: int = None):
+    # 景點資料更新後呼叫；不帶 id 時清空整個快取
+    if catalog_snapshot is not None:
+        # 共用快照裡也是舊資料：整份重建並發佈新版本，每個 worker 都會整份作廢重載
+        catalog_snapshot.publish(read_catalog)
+        clear_local_catalog()
+    else:
+        clear_local_catalog(attraction_id)
+
+
+def loaded_snapshot():
+    # 有設定共用快照且已經對應到檔案時才用，否則照舊查資料庫
+    if catalog_snapshot is not None and catalog_snapshot.version:
+        return catalog_snapshot
+    return None
+
+
+def sync_catalog():
+    # 其他 worker 發佈了新的快照：本機用舊資料建立的快取、索引和回應全部作廢
+    if catalog_snapshot is None or not catalog_snapshot.changed():
+        return
+    with catalog_sync_lock:
+        if catalog_snapshot.changed():
+            catalog_snapshot.ensure(read_catalog)
+            clear_local_catalog()
+
+
+async def check_catalog_version():
+    # async 路由用：版本比對只讀 mmap 裡的一個整數，留在 event loop；要重載（解析索引、可能重建快照）才丟給 run_db
+    if catalog_snapshot is not None and catalog_snapshot.changed():
+        await run_db(sync_catalog)
+
 
-def get_member_username(username: str):
-    query = "SELECT * FROM member WHERE username = %s"
-    with mysql.connector.connect(**DB_CONFIG) as conn:
+def read_catalog():
+    # 整份景點目錄，給共用快照用；剛匯入的資料不一定已經同步到 replica，所以讀 primary
+    with db_pool.connection() as conn:
         with conn.cursor(dictionary=True) as cursor:
-            cursor.execute(query, (username,))
-            return cursor.fetchone()
+            cursor.execute(f"SELECT {ATTRACTION_COLUMNS} FROM attractions a ORDER BY a.id")
+            rows = cursor.fetchall()
+            images = {row["id"]: [] for row in rows}
+            cursor.execute("SELECT attraction_id, image_url FROM images ORDER BY attraction_id, position")
+            for row in cursor.fetchall():
+                if row["attraction_id"] in images:
+                    images[row["attraction_id"]].append(row["image_url"])
+            cursor.execute(MRT_FACET_QUERY)
+            mrts = cursor.fetchall()
+
+    records = {
+        row["id"]: {"attraction": build_attraction(row, images[row["id"]]), "summary": build_summary(row)}
+        for row in rows
+    }
+    # 搜尋與附近景點的索引也打包進快照，worker 直接在 mmap 上查
+    attractions = [record["attraction"] for record in records.values()]
+    return records, {
+        "mrts": mrts,
+        "search": SearchIndex(attractions).pack(),
+        "geo": GeoIndex(attractions).pack(),
+    }
+
+
+MRT_FACET_QUERY = """
+SELECT a.mrt, COUNT(a.id) AS attraction_count
+FROM attractions a
+WHERE a.mrt IS NOT NULL AND a.mrt <> ''
+GROUP BY a.mrt
+ORDER BY attraction_count DESC, a.mrt
+"""
+
+def load_mrt_facet():
+    # 捷運站清單只在景點資料變動時才會改變，算一次後連 JSON body 一起存起來
+    global mrt_facet
+    snapshot = loaded_snapshot()
+    rows = snapshot.extra("mrts") if snapshot is not None else None
+    if rows is None:
+        with db_router.connection(read_only=True) as conn:
+            with conn.cursor(dictionary=True) as cursor:
+                cursor.execute(MRT_FACET_QUERY)
+                rows = cursor.fetchall()
+
+    stations = [row["mrt"] for row in rows]
+    counts = {row["mrt"]: row["attraction_count"] for row in rows}
+    body = dumps({"data": stations, "counts": counts})
+    mrt_facet = {"stations": stations, "counts": counts, "body": body}
+    return mrt_facet
+
+def refresh_catalog():
+    # 景點資料重新匯入後呼叫：清掉快取與索引（有共用快照時重建並通知其他 worker），重新計算捷運站統計
+    invalidate_attraction_cache()
+    load_mrt_facet()
 
 @app.get("/api/attractions")
 async def attractions_api(
     request: Request,
     page: int = Query(0, ge=0),
-    keyword: str = Query(None)
+    keyword: str = Query(None),
+    cursor: str = Query(None),
+    ids: str = Query(None, description="逗號分隔的景點 id；有給時忽略 page/keyword/cursor"),
+    fields: str = Query(None, description="逗號分隔的欄位，例如 name,address,image")
 ):
-    attractions_data, next_page = get_attractions_list(page, keyword)
-    print(f"[DEBUG] page={page}, keyword={keyword}, next_page={next_page}, count={len(attractions_data)}")
+    await check_catalog_version()
+    if ids is not None:
+        return await attractions_bulk(ids, fields)
+
+    cache_key = ("attractions", page, keyword, cursor)
+    cache_version = response_cache.version
+    cached = response_cache.get(cache_key)
+    if cached:
+        return response_cache.respond(request, cached)
+
+    try:
+        attractions_data, next_page, next_cursor = await run_db(get_attractions_list, page, keyword, cursor)
+    except ValueError:
+        return JSONResponse(
+            content={"error": True, "message": "cursor 格式不正確"},
+            status_code=400
+        )
+    logger.debug("attractions page=%s keyword=%r cursor=%s next_page=%s count=%d",
+                 page, keyword, cursor, next_page, len(attractions_data))
 
     if not attractions_data:
         return JSONResponse(
@@ -373,22 +1110,80 @@ async def attractions_api(
             status_code=500
         )
 
-    return JSONResponse({
+    body = dumps({
         "nextPage": next_page,
+        "nextCursor": next_cursor,
         "data": attractions_data
-    }, status_code=200)
+    })
+    return response_cache.respond(request, response_cache.set(cache_key, body, cache_version))
+
+async def attractions_bulk(ids: str, fields: str = None):
+    try:
+        attraction_ids = parse_id_list(ids)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": True, "message": "ids 格式不正確"})
+    if len(attraction_ids) > ATTRACTIONS_BULK_MAX_IDS:
+        return JSONResponse(status_code=400, content={
+            "error": True,
+            "message": f"ids 最多 {ATTRACTIONS_BULK_MAX_IDS} 個"
+        })
+
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    unknown = [field for field in field_list or [] if field not in ATTRACTION_FIELDS]
+    if unknown:
+        return JSONResponse(status_code=400, content={
+            "error": True,
+            "message": f"不支援的欄位：{', '.join(unknown)}"
+        })
+
+    attractions_data, missing = await run_db(lookup_attractions, attraction_ids, field_list)
+    return Response(content=dumps({"data": attractions_data, "missing": missing}), media_type="application/json")
+
+@app.get("/api/attractions/nearby")
+async def attractions_nearby_api(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(None, gt=0, description="公尺；不給時回傳最近的 limit 筆"),
+    limit: int = Query(12, ge=1, le=NEARBY_MAX_LIMIT)
+):
+    await check_catalog_version()
+    attractions_data = await run_db(get_nearby_attractions, lat, lng, radius, limit)
+    return Response(content=dumps({"data": attractions_data}), media_type="application/json")
 
 def add_member_username(name, username, password):
-    with mysql.connector.connect(**DB_CONFIG) as conn:
-        with conn.cursor(dictionary=True) as cursor:
-            query = "INSERT INTO member (name, username, password) VALUES (%s, %s, %s)"
-            cursor.execute(query, (name, username, password))
+    # 直接 INSERT，靠 username 的 UNIQUE 判斷是否已註冊
+    try:
+        with db_pool.connection() as conn:
+            with conn.cursor() as cursor:
+                query = "INSERT INTO member (name, username, password) VALUES (%s, %s, %s)"
+                cursor.execute(query, (name, username, password))
+                conn.commit()
+    except IntegrityError as e:
+        if e.errno == errorcode.ER_DUP_ENTRY:
+            return False
+        raise
+    finally:
+        member_cache.invalidate(username)
+    return True
+
+def update_member_password(username, password_hash):
+    with db_pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("UPDATE member SET password = %s WHERE username = %s", (password_hash, username))
             conn.commit()
+    member_cache.invalidate(username)
 
 
 @app.get("/api/attraction/{attractionId}")
-async def attraction_id_api(attractionId: int):
-    attraction_data = get_single_attraction(attractionId)
+async def attraction_id_api(request: Request, attractionId: int):
+    await check_catalog_version()
+    cache_key = ("attraction", attractionId)
+    cache_version = response_cache.version
+    cached = response_cache.get(cache_key)
+    if cached:
+        return response_cache.respond(request, cached)
+
+    attraction_data = await run_db(get_single_attraction, attractionId)
 
     if not attraction_data:
         return JSONResponse(
@@ -396,28 +1191,51 @@ async def attraction_id_api(attractionId: int):
             status_code=400
         )
 
-    return JSONResponse({"data": attraction_data}, status_code=200)
+    body = dumps({"data": attraction_data})
+    return response_cache.respond(request, response_cache.set(cache_key, body, cache_version))
 
 
 @app.get("/api/mrts")
-async def mrts_api():
-    mrt_data = get_mrt_list()
-    if not mrt_data:
+async def mrts_api(request: Request):
+    await check_catalog_version()
+    cache_version = response_cache.version
+    cached = response_cache.get(("mrts",))
+    if cached:
+        return response_cache.respond(request, cached)
+
+    facet = mrt_facet or await run_db(load_mrt_facet)
+    if not facet["stations"]:
         return JSONResponse(
             content={"error": True, "message": "查無捷運站資料"},
             status_code=500
         )
 
-    return JSONResponse(content={"data": mrt_data}, status_code=200)
+    return response_cache.respond(request, response_cache.set(("mrts",), facet["body"], cache_version))
+
+@app.post("/api/catalog/refresh", include_in_schema=False)
+async def catalog_refresh_api(request: Request):
+    # compare_digest 比對含非 ASCII 字元的 str 會丟 TypeError，先轉成 bytes
+    token = request.headers.get("X-Refresh-Token", "")
+    if not CATALOG_REFRESH_TOKEN or not token or not hmac.compare_digest(token.encode(), CATALOG_REFRESH_TOKEN.encode()):
+        return JSONResponse(status_code=403, content={"error": True, "message": "拒絕存取"})
+
+    await run_db(refresh_catalog)
+    return {"ok": True}
 
 @app.put("/api/user/auth")
 async def signin(form: SigninForm):
-    user = get_member_by_email(form.email)
-    if not user or user["password"] != form.password:
+    user = await run_db(get_member_by_email, form.email)
+    # 帳號不存在也要跑一次 scrypt，否則從回應時間就能分辨信箱有沒有註冊
+    ok, new_hash = await password_hasher.verify(form.password, user["password"] if user else None)
+    if not ok:
         return JSONResponse(status_code=400, content={
             "error": True,
             "message": "帳號或密碼錯誤"
         })
+    if new_hash:
+        # 明文或舊參數的密碼在登入成功時換成新的雜湊
+        await run_db(update_member_password, user["username"], new_hash)
+
     try:
         token = create_access_token({
             "user_id": user["id"],
@@ -434,7 +1252,7 @@ async def signin(form: SigninForm):
 @app.get("/api/user/auth")
 def get_user_auth(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
     token = credentials.credentials
-    payload = decode_access_token(token)
+    payload = verify_access_token(token)
     if not payload:
         return JSONResponse(content={"data": None})
     
@@ -448,37 +1266,36 @@ def get_user_auth(credentials: HTTPAuthorizationCredentials = Depends(auth_schem
 
 @app.post("/api/user")
 async def signup_api(form: SignupForm):
-    user = get_member_by_email(form.email)
-    if user:
+    if member_cache.get(form.email):
         return JSONResponse(status_code=400, content={
             "error": True,
             "message": "Email 已被註冊"
         })
     try:
-        add_member_username(form.name, form.email, form.password)
-        return {"ok": True}
+        hashed = await password_hasher.hash(form.password)
+        created = await run_db(add_member_username, form.name, form.email, hashed)
     except Exception as e:
         return JSONResponse(status_code=500, content={
             "error": True,
             "message": "伺服器內部錯誤"
         })
 
-@app.get("/api/booking")
-def booking_get(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
-    payload = decode_access_token(credentials.credentials)
-    if not payload:
-        return JSONResponse(status_code=403, content={
+    if not created:
+        return JSONResponse(status_code=400, content={
             "error": True,
-            "message": "未登入系統，拒絕存取"
+            "message": "Email 已被註冊"
         })
+    return {"ok": True}
 
+@app.get("/api/booking")
+def booking_get(payload: dict = Depends(member_required)):
     member_id = payload["user_id"]
     booking_data = get_booking_list(member_id)
 
     if not booking_data:
         return JSONResponse(content={"data": None}, status_code=200)
 
-    attraction = get_single_attraction(booking_data["attraction_id"])
+    attraction = get_attraction_summary(booking_data["attraction_id"])
 
     if not attraction:
         return JSONResponse(content={"data": None}, status_code=200)
@@ -489,7 +1306,7 @@ def booking_get(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)
                 "id": attraction["id"],
                 "name": attraction["name"],
                 "address": attraction["address"],
-                "image": attraction["images"][0] if attraction["images"] else None
+                "image": attraction["image"]
             },
             "date": booking_data["date"].isoformat()
             ,
@@ -503,17 +1320,10 @@ def booking_get(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)
 @app.post("/api/booking")
 async def booking_api(
     form: BookingForm,
-    credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)
+    payload: dict = Depends(member_required)
 ):
-    payload = decode_access_token(credentials.credentials)
-    if not payload:
-        return JSONResponse(status_code=403, content={
-            "error": True,
-            "message": "未登入系統，拒絕存取"
-        })
-
     member_id = payload["user_id"]
-    attraction_data = get_single_attraction(form.attractionId)
+    attraction_data = await run_db(get_attraction_summary, form.attractionId)
 
     if not attraction_data:
         return JSONResponse(
@@ -522,137 +1332,187 @@ async def booking_api(
         )
 
     try:
-        add_booking(form.price, form.attractionId, member_id, form.date, form.time)
+        await run_db(add_booking, form.price, form.attractionId, member_id, form.date, form.time)
         return JSONResponse(status_code=200, content={"ok": True})
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("failed to add booking for member %s", member_id)
         return JSONResponse(status_code=500, content={
             "error": True,
             "message": f"伺服器內部錯誤: {str(e)}"
         })
     
 @app.delete("/api/booking")
-def booking_delete(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
-    payload = decode_access_token(credentials.credentials)
-    if not payload:
-        return JSONResponse(status_code=403, content={
-            "error": True,
-            "message": "未登入系統，拒絕存取"
-        })
-
+def booking_delete(payload: dict = Depends(member_required)):
     member_id = payload["user_id"]
-    booking_data = get_booking_list(member_id)
-
-    if not booking_data:
-        return JSONResponse(status_code=500, content={
-            "error": True,
-            "message": "查無預定資料"
-        })
-    
     try:
-        delete_booking(member_id)
-        return {"ok": True}
+        deleted = delete_booking(member_id)
     except Exception as e:
         return JSONResponse(status_code=500, content={
             "error": True,
             "message": "伺服器內部錯誤"
         })
-    
+
+    if not deleted:
+        return JSONResponse(status_code=500, content={
+            "error": True,
+            "message": "查無預定資料"
+        })
+    return {"ok": True}
+
 @app.post("/api/orders")
 async def create_order(
     form: OrderForm,
-    cred: HTTPAuthorizationCredentials = Depends(auth_scheme)
+    payload: dict = Depends(member_required)
 ):
-    payload = decode_access_token(cred.credentials)
-    if not payload:
-        raise HTTPException(403, "未登入")
-
     member_id = payload["user_id"]
 
-    attraction = get_single_attraction(form.order.attractionId)
-    if not attraction:
-        return JSONResponse({"error": True, "message": "景點不存在"}, 400)
-
-    tappay_payload = {
-        "prime":       form.prime,
-        "partner_key": TAPPAY_PARTNER_KEY,
-        "merchant_id": TAPPAY_MERCHANT_ID,
-        "amount":      form.order.price,
-        "details":     f"台北一日遊 - {attraction['name']}"[:100],
-        "cardholder": {
+    if ORDER_PROCESSING == "async":
+        return await accept_order(form, member_id)
+
+    # 先鎖定購物車轉成處理中的訂單再付款，同一個購物車重複送出時只會扣款一次
+    order_no = str(uuid4())[:8]
+    cart = await run_db(
+        complete_order,
+        number = order_no,
+        name  = form.order.contact.name,
+        email = form.order.contact.email,
+        phone = form.order.contact.phone,
+        member_id = member_id,
+        status = ORDER_STATUS_PROCESSING
+    )
+    if not cart:
+        return JSONResponse({"error": True, "message": "查無預定資料"}, 400)
+
+    status, code, message = await charge_order(
+        order_no,
+        prime=form.prime,
+        amount=cart["price"],
+        attraction_id=cart["attraction_id"],
+        cardholder={
             "phone_number": form.order.contact.phone,
             "name":         form.order.contact.name,
             "email":        form.order.contact.email
-        },
-        "remember": False
-    }
+        }
+    )
+    if status == ORDER_STATUS_FAILED:
+        return JSONResponse({"error": True, "message": message}, code)
+    if status == ORDER_STATUS_UNKNOWN:
+        # 和非同步模式一樣回 202，感謝頁會輪詢到對帳完成
+        return JSONResponse({
+            "data": {
+                "number":  order_no,
+                "payment": {"status": None, "message": message}
+            }
+        }, 202)
+    logger.info("payment for order %s by member %s succeeded", order_no, member_id)
 
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": TAPPAY_PARTNER_KEY
+    return {
+        "data": {
+            "number":  order_no,
+            "payment": {"status": 0, "message": "付款成功"}
+        }
     }
 
-    print("TapPay payload:", tappay_payload)
-    print("Env partner_key:", repr(TAPPAY_PARTNER_KEY))
-    print("Env merchant_id:", repr(TAPPAY_MERCHANT_ID))
+def order_details(attraction_id: int):
+    attraction = get_attraction_summary(attraction_id)
+    return f"台北一日遊 - {attraction['name']}" if attraction else "台北一日遊"
 
-    r = requests.post(
-        "https://sandbox.tappaysdk.com/tpc/payment/pay-by-prime",
-        headers=headers,
-        json=tappay_payload,
-        timeout=15
-    )
-    result = r.json()
+async def charge_order(number, prime, amount, attraction_id, cardholder):
+    """Charge a processing order and record the outcome.
 
-    if result.get("status") != 0:
-        return JSONResponse({
-            "error": True,
-            "message": f"TapPay 錯誤：{result.get('msg','unknown')}"
-        }, 400)
-
-    order_no = str(uuid4())[:8]
+    Returns ``(status, http_code, message)``. Only a decline or a failure
+    before the request left this process fails the order and restores the
+    cart; anything after that holds it for reconciliation.
+    """
+    sent = False
+    try:
+        details = await run_db(order_details, attraction_id)
+        sent = True
+        result = await asyncio.wait_for(
+            tappay.pay_by_prime(
+                prime=prime,
+                amount=amount,
+                details=details,
+                cardholder=cardholder,
+                order_number=number
+            ),
+            ORDER_PAYMENT_TIMEOUT
+        )
+    except Exception as e:
+        # TapPayUnknownError、逾時或送出後的其他例外：不知道有沒有扣款，不能放回購物車
+        logger.exception("payment for order %s failed", number)
+        definite = not sent or (isinstance(e, TapPayError) and not isinstance(e, TapPayUnknownError))
+        if not definite:
+            await run_db(hold_order, number)
+            return ORDER_STATUS_UNKNOWN, 202, "付款結果確認中"
+        await run_db(fail_order, number)
+        message = str(e) if isinstance(e, TapPayError) else "付款處理失敗，請稍後再試"
+        return ORDER_STATUS_FAILED, 500, message
 
-    print(order_no)
+    if result.get("status") != 0:
+        await run_db(fail_order, number)
+        return ORDER_STATUS_FAILED, 400, f"TapPay 錯誤：{result.get('msg','unknown')}"
 
-    print("[DEBUG]傳入complete_order：", {
-    "number": order_no,
-    "name": form.order.contact.name,
-    "email": form.order.contact.email,
-    "phone": form.order.contact.phone,
-    "member_id": member_id,
-    "status": 1
-})
+    await run_db(set_order_status, number, ORDER_STATUS_PAID)
+    return ORDER_STATUS_PAID, 200, "付款成功"
 
-    complete_order(
+async def accept_order(form: OrderForm, member_id: int):
+    # 先把購物車標記為處理中並回傳訂單編號，付款與完成訂單交給 order_queue
+    order_no = str(uuid4())[:8]
+    cart = await run_db(
+        complete_order,
         number = order_no,
         name  = form.order.contact.name,
         email = form.order.contact.email,
         phone = form.order.contact.phone,
         member_id = member_id,
-        status = 1
+        status = ORDER_STATUS_PROCESSING
     )
+    if not cart:
+        return JSONResponse({"error": True, "message": "查無預定資料"}, 400)
 
-    return {
+    try:
+        order_queue.submit({
+            "number": order_no,
+            "prime": form.prime,
+            "amount": cart["price"],
+            "attraction_id": cart["attraction_id"],
+            "cardholder": {
+                "phone_number": form.order.contact.phone,
+                "name":         form.order.contact.name,
+                "email":        form.order.contact.email
+            }
+        })
+    except asyncio.QueueFull:
+        await run_db(fail_order, order_no)
+        return JSONResponse({"error": True, "message": "系統忙碌中，請稍後再試"}, 503)
+
+    return JSONResponse({
         "data": {
             "number":  order_no,
-            "payment": {"status": 0, "message": "付款成功"}
+            "payment": {"status": None, "message": "付款處理中"}
         }
-    }
+    }, 202)
+
+async def process_order(job: dict):
+    # 和同步模式共用 charge_order：逾時或送出後的例外改成待對帳，不會放回購物車
+    async with order_queue.stage("payment"):
+        await charge_order(
+            job["number"],
+            prime=job["prime"],
+            amount=job["amount"],
+            attraction_id=job["attraction_id"],
+            cardholder=job["cardholder"]
+        )
 
 @app.get("/api/order/{orderNumber}")
-def order_get(orderNumber: str, credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
-    payload = decode_access_token(credentials.credentials)
-    if not payload:
-        return JSONResponse(status_code=403, content={
-            "error": True,
-            "message": "未登入系統，拒絕存取"
-        })
-
-    order = get_order_by_number(orderNumber)
+def order_get(orderNumber: str, payload: dict = Depends(member_required)):
+    # 訂單含聯絡資料，只回傳自己的訂單；別人的訂單編號和不存在一樣
+    order = get_order_by_number(orderNumber, payload["user_id"])
     if not order:
         return JSONResponse(content={"data": None}, status_code=200)
 
-    attraction = get_single_attraction(order["attraction_id"])
+    attraction = get_attraction_summary(order["attraction_id"])
     if not attraction:
         return JSONResponse(status_code=500, content={"error": True, "message": "查無景點資料"})
 
@@ -665,7 +1525,7 @@ def order_get(orderNumber: str, credentials: HTTPAuthorizationCredentials = Depe
                     "id": attraction["id"],
                     "name": attraction["name"],
                     "address": attraction["address"],
-                    "image": attraction["images"][0] if attraction["images"] else None
+                    "image": attraction["image"]
                 },
                 "date": order["date"].isoformat(),
                 "time": order["time"]
@@ -681,25 +1541,17 @@ def order_get(orderNumber: str, credentials: HTTPAuthorizationCredentials = Depe
     return JSONResponse(result, status_code=200)
 
 @app.get("/api/member")
-def booking_get_all(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
-    payload = decode_access_token(credentials.credentials)
-    if not payload:
-        return JSONResponse(status_code=403, content={
-            "error": True,
-            "message": "未登入系統，拒絕存取"
-        })
-
+def booking_get_all(payload: dict = Depends(member_required)):
     member_id = payload["user_id"]
     orders = get_booking_list_all(member_id)
-    print(f"📦 查詢到訂單數量：{len(orders) if orders else 0}")
     if not orders:
         return JSONResponse(content={"data": None}, status_code=200)
 
+    attractions = get_attraction_summaries([order["attraction_id"] for order in orders])
     result = []
 
     for order in orders:
-        print("👉 order 資料：", order)
-        attraction = get_single_attraction(order["attraction_id"])
+        attraction = attractions.get(order["attraction_id"])
         if not attraction:
             continue
 
@@ -711,7 +1563,7 @@ def booking_get_all(credentials: HTTPAuthorizationCredentials = Depends(auth_sch
                     "id": attraction["id"],
                     "name": attraction["name"],
                     "address": attraction["address"],
-                    "image": attraction["images"][0] if attraction["images"] else None
+                    "image": attraction["image"]
                 },
                 "date": order["date"].isoformat(),
                 "time": order["time"]
@@ -728,32 +1580,46 @@ def booking_get_all(credentials: HTTPAuthorizationCredentials = Depends(auth_sch
 
 
 @app.get("/api/favorite")
-async def get_favorite(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
-    payload = decode_access_token(credentials.credentials)
-    if not payload:
-        return JSONResponse(status_code=403, content={
-            "error": True,
-            "message": "未登入系統，無法查看喜愛景點"
-        })
-
+async def get_favorite(payload: dict = Depends(favorite_member_required)):
     member_id = payload["user_id"]
-    favorite_data = get_favorite_list(member_id)
+    favorite_data = await run_db(get_favorite_list, member_id)
     return JSONResponse(status_code=200, content={
         "data": favorite_data or []                        # ✔ 至少回空陣列
     })
 
-@app.post("/api/favorite")
-async def post_add_favorite(attractionId: int, credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
-    payload = decode_access_token(credentials.credentials)
-    if not payload:
-        return JSONResponse(status_code=403, content={
+@app.get("/api/favorite/ids")
+async def get_favorite_id_list(payload: dict = Depends(favorite_member_required)):
+    member_id = payload["user_id"]
+    ids = await run_db(get_favorite_ids, member_id)
+    return {"data": list(ids)}
+
+@app.get("/api/favorite/contains")
+async def get_favorite_contains(
+    ids: str = Query(..., description="逗號分隔的景點 id，例如 1,2,3"),
+    payload: dict = Depends(favorite_member_required)
+):
+    # 列表頁一次問一整頁的景點是否已收藏，回傳和 ids 同順序的 true/false
+    try:
+        attraction_ids = parse_id_list(ids)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": True, "message": "ids 格式不正確"})
+    if len(attraction_ids) > FAVORITE_CONTAINS_MAX_IDS:
+        return JSONResponse(status_code=400, content={
             "error": True,
-            "message": "未登入系統，無法查看喜愛景點"
+            "message": f"ids 最多 {FAVORITE_CONTAINS_MAX_IDS} 個"
         })
 
+    member_id = payload["user_id"]
+    favorite_ids = favorite_cache.get(member_id)
+    if favorite_ids is None:
+        favorite_ids = await run_db(get_favorite_ids, member_id)
+    return {"data": [attraction_id in favorite_ids for attraction_id in attraction_ids]}
+
+@app.post("/api/favorite")
+async def post_add_favorite(attractionId: int, payload: dict = Depends(favorite_member_required)):
     member_id = payload["user_id"]
     try:
-        add_favorite(attractionId, member_id)
+        await run_db(add_favorite, attractionId, member_id)
         return {"ok": True}
     except Exception as e:
         return JSONResponse(status_code=500, content={
@@ -762,17 +1628,10 @@ async def post_add_favorite(attractionId: int, credentials: HTTPAuthorizationCre
         })
     
 @app.delete("/api/favorite")
-async def delete_favorite(attractionId: int, credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
-    payload = decode_access_token(credentials.credentials)
-    if not payload:
-        return JSONResponse(status_code=403, content={
-            "error": True,
-            "message": "未登入系統，無法查看喜愛景點"
-        })
-
+async def delete_favorite(attractionId: int, payload: dict = Depends(favorite_member_required)):
     member_id = payload["user_id"]
     try:
-        remove_favorite(attractionId, member_id)
+        await run_db(remove_favorite, attractionId, member_id)
         return {"ok": True}
     except Exception as e:
         return JSONResponse(status_code=500, content={
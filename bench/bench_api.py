@@ -0,0 +1,229 @@
+"""Load-test the FastAPI app in-process against a seeded local database.
+
+The database is a SQLite stand-in for MySQL (bench/mysql_standin.py) seeded
+from data/taipei-attractions.json, and TapPay is the local stub in
+bench/tappay_stub.py, so nothing outside this process is needed:
+
+    python bench/bench_api.py --requests 500 --concurrency 20
+    python bench/bench_api.py --output bench/results/baseline.json
+    python bench/bench_api.py --baseline bench/results/baseline.json   # exits 1 on regression
+
+Each scenario reports throughput, p50/p95/p99 latency, DB queries per
+request and connections opened. Results go to a temp file unless --output
+is given; only named baselines under bench/results/ are committed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+os.environ.setdefault("SECRET_KEY", "bench-secret-key-that-is-long-enough-for-hs256")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("PASSWORD_SCRYPT_N", str(2 ** 12))
+os.environ.setdefault("TAPPAY_STUB_DELAY_MS", "50")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("TAPPAY_URL", "http://tappay.stub/tpc/payment/pay-by-prime")
+
+import httpx  # noqa: E402
+
+from bench import mysql_standin, tappay_stub  # noqa: E402
+
+KEYWORDS = ["北投", "公園", "溫泉", "博物館", "士林", "新北投", "大安"]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+# 每個操作回傳它發出的 response 清單
+async def browse_page(client, ctx):
+    return [await client.get(f"/api/attractions?page={ctx['rng'].randint(0, 4)}")]
+
+async def browse_search(client, ctx):
+    keyword = ctx["rng"].choice(KEYWORDS)
+    return [await client.get("/api/attractions", params={"keyword": keyword})]
+
+async def browse_detail(client, ctx):
+    return [await client.get(f"/api/attraction/{ctx['rng'].choice(ctx['attraction_ids'])}")]
+
+async def browse_mrts(client, ctx):
+    return [await client.get("/api/mrts")]
+
+async def member_booking(client, ctx):
+    headers = ctx["rng"].choice(ctx["members"])
+    created = await client.post("/api/booking", headers=headers, json={
+        "price": 2000, "attractionId": ctx["rng"].choice(ctx["attraction_ids"]),
+        "date": "2026-01-01", "time": "morning"
+    })
+    return [created, await client.get("/api/booking", headers=headers)]
+
+async def member_checkout(client, ctx):
+    headers = ctx["rng"].choice(ctx["members"])
+    booked = await client.post("/api/booking", headers=headers, json={
+        "price": 2500, "attractionId": ctx["rng"].choice(ctx["attraction_ids"]),
+        "date": "2026-01-02", "time": "afternoon"
+    })
+    ordered = await client.post("/api/orders", headers=headers, json={
+        "prime": "bench",
+        "order": {
+            "price": 2500, "attractionId": 1, "date": "2026-01-02", "time": "afternoon",
+            "contact": {"name": "bench", "email": "bench@example.com", "phone": "0912345678"}
+        }
+    })
+    responses = [booked, ordered]
+    number = ordered.json().get("data", {}).get("number") if ordered.status_code < 300 else None
+    if number:
+        responses.append(await client.get(f"/api/order/{number}", headers=headers))
+    return responses
+
+async def member_history(client, ctx):
+    return [await client.get("/api/member", headers=ctx["rng"].choice(ctx["members"]))]
+
+async def member_favorites(client, ctx):
+    headers = ctx["rng"].choice(ctx["members"])
+    attraction_id = ctx["rng"].choice(ctx["attraction_ids"])
+    return [
+        await client.post(f"/api/favorite?attractionId={attraction_id}", headers=headers),
+        await client.get("/api/favorite", headers=headers),
+        await client.delete(f"/api/favorite?attractionId={attraction_id}", headers=headers),
+    ]
+
+SCENARIOS = {
+    "browse": [(4, browse_page), (3, browse_search), (4, browse_detail), (1, browse_mrts)],
+    "member": [(3, member_booking), (1, member_checkout), (3, member_history), (2, member_favorites)],
+}
+
+
+async def run_scenario(name, client, ctx, total, concurrency):
+    ops = SCENARIOS[name]
+    weights = [weight for weight, _ in ops]
+    latencies = []
+    errors = 0
+    requests_count = 0
+    before = dict(mysql_standin.counters)
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(ctx["rng"].choices(ops, weights)[0][1])
+
+    async def worker():
+        nonlocal errors, requests_count
+        while not queue.empty():
+            op = queue.get_nowait()
+            started = time.perf_counter()
+            responses = await op(client, ctx)
+            elapsed = (time.perf_counter() - started) / len(responses)
+            for r in responses:
+                requests_count += 1
+                latencies.append(elapsed)
+                if r.status_code >= 500:
+                    errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests_count,
+        "errors": errors,
+        "throughput_rps": round(requests_count / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "queries_per_request": round((mysql_standin.counters["queries"] - before["queries"]) / requests_count, 3),
+        "connections_opened": mysql_standin.counters["connections"] - before["connections"],
+    }
+
+
+async def bench(args):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.sqlite3")
+    mysql_standin.create_database(db_path)
+
+    import app as app_module
+    app_module.db_pool.connector = mysql_standin.connector(db_path)
+    app_module.tappay.transport = httpx.ASGITransport(app=tappay_stub.app)
+
+    results = {}
+    async with app_module.app.router.lifespan_context(app_module.app):
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            ctx = {"rng": random.Random(args.seed), "members": [], "attraction_ids": list(range(1, 59))}
+            for i in range(args.members):
+                member = {"name": f"bench{i}", "email": f"bench{i}@example.com", "password": "bench-password"}
+                await client.post("/api/user", json=member)
+                r = await client.put("/api/user/auth", json={"email": member["email"], "password": member["password"]})
+                ctx["members"].append({"Authorization": f"Bearer {r.json()['token']}"})
+
+            for name in args.scenarios:
+                results[name] = await run_scenario(name, client, ctx, args.requests, args.concurrency)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current["queries_per_request"] > previous["queries_per_request"] + 0.01:
+            regressions.append(f"{name}: queries/request {previous['queries_per_request']} -> {current['queries_per_request']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500, help="operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--members", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--output", default=os.path.join(tempfile.gettempdir(), "bench_api_latest.json"))
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = asyncio.run(bench(args))
+
+    print(f"{'scenario':<10} {'req':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/req':>6} {'conns':>6}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['requests']:>6} {r['errors']:>4} {r['throughput_rps']:>8} {r['p50_ms']:>8} "
+              f"{r['p95_ms']:>8} {r['p99_ms']:>8} {r['queries_per_request']:>6} {r['connections_opened']:>6}")
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"commit": commit, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+                   "results": results}, f, indent=2)
+    print(f"saved {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
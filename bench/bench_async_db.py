@@ -0,0 +1,84 @@
+"""Requests/sec and p99 latency of the catalog endpoints under concurrent load,
+with DB helpers called inline on the event loop ("before") versus offloaded
+through run_db ("after").
+
+The DB helpers are replaced with a fake that sleeps for --query-ms to stand in
+for a MySQL round trip, so the benchmark runs without a database:
+
+    python bench/bench_async_db.py --requests 400 --concurrency 50 --query-ms 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+os.environ.setdefault("SECRET_KEY", "bench-secret-key-that-is-long-enough-for-hs256")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+
+import app as app_module  # noqa: E402
+
+
+def fake_attractions(query_ms):
+    def get_attractions_list(page=0, keyword=None, cursor=None):
+        time.sleep(query_ms / 1000)
+        return [{"id": 1, "name": "新北投溫泉區"}], None, None
+    return get_attractions_list
+
+
+async def inline_runner(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+async def run(mode, total, concurrency):
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app_module.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with sem:
+                started = time.perf_counter()
+                r = await client.get("/api/attractions")
+                latencies.append(time.perf_counter() - started)
+                assert r.status_code == 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{mode:>7}: {total / elapsed:8.1f} req/s   "
+          f"p50 {statistics.median(latencies) * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    app_module.get_attractions_list = fake_attractions(args.query_ms)
+    # 每個請求都要真的呼叫 DB helper：關掉回應快取，否則量到的只是快取命中
+    app_module.response_cache.get = lambda key: None
+    offloaded = app_module.run_db
+
+    app_module.run_db = inline_runner
+    asyncio.run(run("before", args.requests, args.concurrency))
+
+    app_module.run_db = offloaded
+    asyncio.run(run("after", args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Hammer one member's cart with concurrent requests and check the invariants.
+
+    python bench/bench_cart_race.py [--clicks 50] [--rounds 20]
+
+Each round fires ``--clicks`` simultaneous POST /api/booking requests, the
+way a double-clicking user would. The member must then have exactly one
+cart row. Next it fires the same number of simultaneous POST /api/orders
+for that cart: exactly one order may be created, and the cart must be
+empty afterwards. DELETE /api/booking must never touch paid orders.
+Runs against the SQLite stand-in and the TapPay stub; exits 1 on any violation.
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+os.environ.setdefault("SECRET_KEY", "bench-secret-key-that-is-long-enough-for-hs256")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("PASSWORD_SCRYPT_N", str(2 ** 12))
+os.environ.setdefault("TAPPAY_STUB_DELAY_MS", "5")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("ORDER_PROCESSING", "sync")
+os.environ.setdefault("TAPPAY_URL", "http://tappay.stub/tpc/payment/pay-by-prime")
+
+import httpx  # noqa: E402
+
+from bench import mysql_standin, tappay_stub  # noqa: E402
+
+
+def count(db_path, sql, *params):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+async def race(args):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="cart-"), "cart.sqlite3")
+    mysql_standin.create_database(db_path)
+
+    import app as app_module
+    app_module.db_pool.connector = mysql_standin.connector(db_path)
+    app_module.tappay.transport = httpx.ASGITransport(app=tappay_stub.app)
+
+    failures = []
+    async with app_module.app.router.lifespan_context(app_module.app):
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            member = {"name": "race", "email": "race@example.com", "password": "race-password"}
+            await client.post("/api/user", json=member)
+            r = await client.put("/api/user/auth", json={"email": member["email"], "password": member["password"]})
+            headers = {"Authorization": f"Bearer {r.json()['token']}"}
+            member_id = count(db_path, "SELECT id FROM member WHERE username = ?", member["email"])
+
+            for round_no in range(args.rounds):
+                bookings = await asyncio.gather(*(
+                    client.post("/api/booking", headers=headers, json={
+                        "price": 2000 + i, "attractionId": 1 + i % 10,
+                        "date": "2026-01-01", "time": "morning"
+                    })
+                    for i in range(args.clicks)
+                ))
+                if any(r.status_code != 200 for r in bookings):
+                    failures.append(f"round {round_no}: booking statuses {sorted({r.status_code for r in bookings})}")
+                carts = count(db_path, "SELECT COUNT(*) FROM cart WHERE member_id = ?", member_id)
+                if carts != 1:
+                    failures.append(f"round {round_no}: {carts} cart rows after concurrent bookings")
+
+                paid_before = count(db_path, "SELECT COUNT(*) FROM orders WHERE member_id = ?", member_id)
+                orders = await asyncio.gather(*(
+                    client.post("/api/orders", headers=headers, json={
+                        "prime": "race",
+                        "order": {
+                            "price": 2000, "attractionId": 1, "date": "2026-01-01", "time": "morning",
+                            "contact": {"name": "race", "email": "race@example.com", "phone": "0912345678"}
+                        }
+                    })
+                    for _ in range(args.clicks)
+                ))
+                created = count(db_path, "SELECT COUNT(*) FROM orders WHERE member_id = ?", member_id) - paid_before
+                succeeded = sum(1 for r in orders if r.status_code == 200)
+                if created != 1 or succeeded != 1:
+                    failures.append(f"round {round_no}: {created} orders created, {succeeded} checkouts succeeded")
+                if count(db_path, "SELECT COUNT(*) FROM cart WHERE member_id = ?", member_id) != 0:
+                    failures.append(f"round {round_no}: cart not emptied by checkout")
+
+                await client.post("/api/booking", headers=headers, json={
+                    "price": 2000, "attractionId": 1, "date": "2026-01-01", "time": "morning"
+                })
+                await client.delete("/api/booking", headers=headers)
+                if count(db_path, "SELECT COUNT(*) FROM orders WHERE member_id = ?", member_id) != paid_before + created:
+                    failures.append(f"round {round_no}: DELETE /api/booking removed orders")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clicks", type=int, default=50, help="concurrent requests per burst")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    failures = asyncio.run(race(args))
+    if failures:
+        print("FAILED\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print(f"ok: {args.rounds} rounds x {args.clicks} concurrent bookings/checkouts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Signins per second per core at each scrypt cost (PASSWORD_SCRYPT_N).
+
+    python bench/bench_password.py --costs 12 13 14 15 16
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from utils.password import hash_password, verify_password  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--costs", type=int, nargs="+", default=[12, 13, 14, 15, 16],
+                        help="log2 of scrypt N")
+    parser.add_argument("--r", type=int, default=8)
+    parser.add_argument("--p", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{'N':>8} {'ms/verify':>10} {'signins/s/core':>15}")
+    for cost in args.costs:
+        n = 2 ** cost
+        stored = hash_password("correct horse battery staple", n, args.r, args.p)
+
+        count = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < args.seconds:
+            verify_password("correct horse battery staple", stored)
+            count += 1
+        per_verify = (time.perf_counter() - started) / count
+
+        print(f"{n:>8} {per_verify * 1000:>10.2f} {1 / per_verify:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Check read/write splitting against a primary and two stand-in replicas.
+
+    python bench/bench_replicas.py [--strategy round_robin|least_connections]
+
+The replicas are copies of the seeded primary SQLite file that never receive
+writes, i.e. replicas with infinite lag. The check asserts that:
+
+- catalog reads land on the replicas, spread across both;
+- member reads (cart, orders) always go to the primary, so a member sees
+  their own writes no matter which worker serves the follow-up request;
+- with one replica down, reads fail over without errors, and the dead
+  replica is marked unhealthy;
+- with every replica down, reads are served by the primary.
+
+Exits 1 on any violation.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+os.environ.setdefault("SECRET_KEY", "bench-secret-key-that-is-long-enough-for-hs256")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("PASSWORD_SCRYPT_N", str(2 ** 12))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["DB_REPLICA_HOSTS"] = "replica-1,replica-2"
+
+import httpx  # noqa: E402
+from mysql.connector import errors  # noqa: E402
+
+from bench import mysql_standin  # noqa: E402
+
+
+def unreachable(**config):
+    raise errors.OperationalError(msg=f"Can't connect to MySQL server on '{config.get('host')}'", errno=2003)
+
+
+async def check(strategy):
+    directory = tempfile.mkdtemp(prefix="replicas-")
+    primary = os.path.join(directory, "primary.sqlite3")
+    mysql_standin.create_database(primary)
+    replicas = []
+    for i in (1, 2):
+        path = os.path.join(directory, f"replica-{i}.sqlite3")
+        shutil.copy(primary, path)
+        replicas.append(path)
+    conn = sqlite3.connect(primary)
+    ids = [row[0] for row in conn.execute("SELECT id FROM attractions ORDER BY id")]
+    conn.close()
+
+    import app as app_module
+    app_module.db_pool.connector = mysql_standin.connector(primary)
+    for pool, path in zip(app_module.db_replicas, replicas):
+        pool.connector = mysql_standin.connector(path)
+    app_module.db_router.strategy = strategy
+
+    queries = mysql_standin.queries_by_path
+    failures = []
+
+    def expect(condition, message):
+        if not condition:
+            failures.append(message)
+
+    async with app_module.app.router.lifespan_context(app_module.app):
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # 啟動時清理逾時訂單的查詢走 primary，等它跑完再開始計數
+            await asyncio.sleep(0.2)
+            # 目錄讀取：不同的景點 id，避開回應快取與景點快取
+            before = dict(queries)
+            responses = await asyncio.gather(*(client.get(f"/api/attraction/{i}") for i in ids[:40]))
+            expect(all(r.status_code == 200 for r in responses), "catalog reads failed")
+            on_replicas = [queries[path] - before.get(path, 0) for path in replicas]
+            # least_connections 在負載低時可能一直選同一台，只要求沒有打到 primary
+            if strategy == "round_robin":
+                expect(all(n > 0 for n in on_replicas), f"catalog reads not spread across replicas: {on_replicas}")
+            expect(queries[primary] == before.get(primary, 0), "catalog reads hit the primary")
+
+            # 會員資料讀 primary：這裡的 replica 永遠不會同步，讀到 replica 就看不到剛加入的購物車
+            member = {"name": "member", "email": "member@example.com", "password": "member-password"}
+            await client.post("/api/user", json=member)
+            r = await client.put("/api/user/auth", json={"email": member["email"], "password": member["password"]})
+            headers = {"Authorization": f"Bearer {r.json()['token']}"}
+            await client.post("/api/booking", headers=headers, json={
+                "price": 2000, "attractionId": 3, "date": "2026-01-01", "time": "morning"
+            })
+            before_replicas = [queries[path] for path in replicas]
+            for _ in range(3):
+                r = await client.get("/api/booking", headers=headers)
+                expect((r.json().get("data") or {}).get("attraction", {}).get("id") == 3,
+                       "read-your-writes: cart not visible after booking")
+                r = await client.get("/api/member", headers=headers)
+                expect(r.status_code == 200, "member order history failed")
+            expect([queries[path] for path in replicas] == before_replicas, "member reads hit a replica")
+
+            # 一台 replica 掛掉：標記為不健康，讀取照常
+            dead = app_module.db_replicas[0]
+            dead.connector = unreachable
+            dead.dispose()
+            responses = [await client.get(f"/api/attraction/{i}") for i in ids[40:]]
+            expect(all(r.status_code == 200 for r in responses), "reads failed while one replica was down")
+            stats = app_module.db_router.stats()
+            expect(stats["failovers"] >= 1 and not stats["replicas"][0]["healthy"],
+                   "dead replica was not marked unhealthy")
+
+            # 全部 replica 掛掉：改由 primary 服務
+            for pool in app_module.db_replicas:
+                pool.connector = unreachable
+                pool.dispose()
+            app_module.invalidate_attraction_cache()
+            before_primary = queries[primary]
+            responses = [await client.get(f"/api/attraction/{i}") for i in ids[:10]]
+            expect(all(r.status_code == 200 for r in responses), "reads failed with every replica down")
+            expect(queries[primary] > before_primary, "primary did not take over reads")
+
+            stats = app_module.db_router.stats()
+
+    return failures, stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strategy", default="round_robin", choices=["round_robin", "least_connections"])
+    args = parser.parse_args()
+
+    failures, stats = asyncio.run(check(args.strategy))
+    print(f"routed={stats['routed']} failovers={stats['failovers']}")
+    if failures:
+        print("FAILED\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print(f"ok: read/write splitting ({args.strategy})")
+
+
+if __name__ == "__main__":
+    main()
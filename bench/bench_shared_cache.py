@@ -0,0 +1,234 @@
+"""Check the catalog snapshot shared between worker processes.
+
+    python bench/bench_shared_cache.py [--workers 4]
+
+Starts ``--workers`` separate processes, each importing app.py with the same
+CATALOG_SNAPSHOT_DIR and SQLite stand-in database, the way several uvicorn
+workers share one host. The check asserts that:
+
+- only the first worker reads the catalog from the database at startup;
+- later workers start warm: detail, MRT, search and nearby requests run no
+  queries at all;
+- every worker returns the same ETag for the same body;
+- workers answer from the snapshot without copying it: the per-process
+  attraction caches stay empty and the search and geo indexes are the
+  packed ones inside the mapping;
+- a catalog refresh on one worker is seen by every other worker on its
+  next request, without restarting it.
+
+Also prints the snapshot size, each worker's private and shared memory in
+the mapping, and each worker's RSS and USS (private memory of the whole
+process) at startup and after serving the catalog requests. The USS growth
+is what each extra worker costs for the catalog and should stay small and
+flat as workers are added.
+
+Exits 1 on any violation.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+REFRESH_TOKEN = "bench-refresh-token"
+
+
+def mapping_memory(directory):
+    # /proc/self/smaps 裡快照檔那段對應：Private 是這個 process 自己的，Shared 是和其他 worker 共用的
+    private = shared = 0
+    try:
+        with open("/proc/self/smaps") as f:
+            inside = False
+            for line in f:
+                if line[0] in "0123456789abcdef" and " " in line and "-" in line.split()[0]:
+                    inside = directory in line and "snapshot-" in line
+                elif inside and line.startswith(("Private_Clean:", "Private_Dirty:")):
+                    private += int(line.split()[1])
+                elif inside and line.startswith(("Shared_Clean:", "Shared_Dirty:")):
+                    shared += int(line.split()[1])
+    except OSError:
+        return None
+    return {"private_kb": private, "shared_kb": shared}
+
+
+def process_memory():
+    # /proc/self/smaps_rollup：RSS 含共用頁面，USS（Private_*）是這個 worker 獨佔的記憶體
+    values = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if rest.strip().endswith("kB"):
+                    values[name] = int(rest.split()[0])
+    except OSError:
+        return None
+    return {"rss_kb": values.get("Rss", 0),
+            "uss_kb": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)}
+
+
+def worker(conn, db_path, snapshot_dir):
+    os.environ.setdefault("SECRET_KEY", "bench-secret-key-that-is-long-enough-for-hs256")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["CATALOG_SNAPSHOT_DIR"] = snapshot_dir
+    os.environ["CATALOG_REFRESH_TOKEN"] = REFRESH_TOKEN
+
+    import httpx
+    from bench import mysql_standin
+    import app as app_module
+
+    app_module.db_pool.connector = mysql_standin.connector(db_path)
+
+    async def serve():
+        async with app_module.app.router.lifespan_context(app_module.app):
+            conn.send(("started", mysql_standin.counters["queries"], process_memory()))
+            transport = httpx.ASGITransport(app=app_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                loop = asyncio.get_running_loop()
+                while True:
+                    command = await loop.run_in_executor(None, conn.recv)
+                    if command is None:
+                        break
+                    method, path = command
+                    if method == "STATE":
+                        conn.send({
+                            "attraction_cache": len(app_module.attraction_cache),
+                            "summary_cache": len(app_module.attraction_summary_cache),
+                            "search_index": type(app_module.search_index).__name__,
+                            "geo_index": type(app_module.geo_index._ids).__name__
+                            if app_module.geo_index is not None else None,
+                            "process": process_memory(),
+                        })
+                        continue
+                    before = mysql_standin.counters["queries"]
+                    headers = {"X-Refresh-Token": REFRESH_TOKEN} if method == "POST" else {}
+                    r = await client.request(method, path, headers=headers)
+                    conn.send({
+                        "status": r.status_code,
+                        "body": r.json() if r.content else None,
+                        "etag": r.headers.get("etag"),
+                        "queries": mysql_standin.counters["queries"] - before,
+                        "memory": mapping_memory(snapshot_dir),
+                    })
+
+    asyncio.run(serve())
+
+
+class Worker:
+    def __init__(self, db_path, snapshot_dir):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker, args=(child, db_path, snapshot_dir))
+        self.process.start()
+        _, self.startup_queries, self.startup_memory = self.conn.recv()
+
+    def request(self, method, path):
+        self.conn.send((method, path))
+        return self.conn.recv()
+
+    def get(self, path):
+        return self.request("GET", path)
+
+    def state(self):
+        return self.request("STATE", None)
+
+    def stop(self):
+        self.conn.send(None)
+        self.process.join(10)
+
+
+def check(count):
+    directory = tempfile.mkdtemp(prefix="shared-cache-")
+    db_path = os.path.join(directory, "catalog.sqlite3")
+    snapshot_dir = os.path.join(directory, "snapshot")
+    from bench import mysql_standin
+    mysql_standin.create_database(db_path)
+
+    failures = []
+
+    def expect(condition, message):
+        if not condition:
+            failures.append(message)
+
+    # 第一個 worker 先啟動並建立快照，其他的在它之後啟動
+    workers = [Worker(db_path, snapshot_dir)]
+    workers += [Worker(db_path, snapshot_dir) for _ in range(count - 1)]
+    try:
+        expect(workers[0].startup_queries > 0, "first worker did not build the snapshot")
+        for i, w in enumerate(workers[1:], 2):
+            expect(w.startup_queries == 0, f"worker {i} queried the database at startup")
+
+        paths = ["/api/attraction/1", "/api/mrts", "/api/attractions?keyword=公園",
+                 "/api/attractions/nearby?lat=25.04&lng=121.52&limit=5",
+                 "/api/attractions?ids=1,2,3&fields=name,image"]
+        etags = {}
+        for i, w in enumerate(workers[1:], 2):
+            for path in paths:
+                r = w.get(path)
+                expect(r["status"] == 200, f"worker {i}: {path} returned {r['status']}")
+                expect(r["queries"] == 0, f"worker {i}: {path} ran {r['queries']} queries on a warm snapshot")
+                if r["etag"]:
+                    etags.setdefault(path, set()).add(r["etag"])
+        expect(all(len(tags) == 1 for tags in etags.values()), f"workers disagree on ETags: {etags}")
+
+        # 快照命中不複製到本機快取，索引直接用 mmap 裡打包好的那份（memoryview）
+        states = [w.state() for w in workers]
+        for i, state in enumerate(states[1:], 2):
+            expect(state["attraction_cache"] == 0 and state["summary_cache"] == 0,
+                   f"worker {i} copied snapshot entries into its local caches: {state}")
+            expect(state["search_index"] == "PackedSearchIndex" and state["geo_index"] == "memoryview",
+                   f"worker {i} built its own indexes instead of using the snapshot: {state}")
+        processes = [(w.startup_memory, state["process"]) for w, state in zip(workers, states)]
+
+        # 直接改資料庫，再從第一個 worker 觸發 refresh，其他 worker 下一次請求就要看到新資料
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE attractions SET name = ? WHERE id = 1", ("新名字",))
+        conn.commit()
+        conn.close()
+        r = workers[0].request("POST", "/api/catalog/refresh")
+        expect(r["status"] == 200, f"refresh returned {r['status']}")
+        for i, w in enumerate(workers, 1):
+            r = w.get("/api/attraction/1")
+            expect((r["body"] or {}).get("data", {}).get("name") == "新名字",
+                   f"worker {i} still serves the old catalog after a refresh")
+
+        memory = [w.get("/api/attraction/2")["memory"] for w in workers]
+    finally:
+        for w in workers:
+            w.stop()
+
+    snapshot_bytes = sum(
+        os.path.getsize(os.path.join(snapshot_dir, name))
+        for name in os.listdir(snapshot_dir) if name.startswith("snapshot-")
+    )
+    return failures, snapshot_bytes, memory, processes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    multiprocessing.set_start_method("spawn")
+    failures, snapshot_bytes, memory, processes = check(max(2, args.workers))
+    print(f"snapshot files: {snapshot_bytes / 1024:.1f} KiB on disk")
+    for i, m in enumerate(memory, 1):
+        if m is not None:
+            print(f"  worker {i}: mapping private={m['private_kb']} KiB shared={m['shared_kb']} KiB")
+    for i, (start, after) in enumerate(processes, 1):
+        if start is not None and after is not None:
+            print(f"  worker {i}: rss={after['rss_kb']} KiB uss={after['uss_kb']} KiB "
+                  f"(uss {after['uss_kb'] - start['uss_kb']:+d} KiB after catalog requests)")
+    if failures:
+        print("FAILED\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print(f"ok: {len(memory)} workers share one catalog snapshot")
+
+
+if __name__ == "__main__":
+    main()
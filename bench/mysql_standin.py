@@ -0,0 +1,220 @@
+"""SQLite-backed stand-in for mysql.connector, used by the benchmarks so they
+run without a MySQL server.
+
+It implements the slice of the connector API the app uses (pooled
+connections, dictionary cursors, commit/rollback/ping) and rewrites the few
+MySQL-only bits of SQL the app issues. Every connection and statement is
+counted, so a benchmark can report connections opened and queries per
+request.
+"""
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+
+from mysql.connector import errorcode, errors
+
+from utils.etl import iter_records, to_rows
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS member (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS attractions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT,
+    description TEXT,
+    address TEXT,
+    transport TEXT,
+    mrt TEXT,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    cover_image TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_attractions_mrt ON attractions (mrt);
+CREATE TABLE IF NOT EXISTS images (
+    attraction_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    image_url TEXT NOT NULL,
+    PRIMARY KEY (attraction_id, position)
+);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    number TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    attraction_id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    time TEXT NOT NULL,
+    name TEXT,
+    email TEXT,
+    phone TEXT,
+    status INTEGER,
+    order_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_orders_member_status_time ON orders (member_id, status, order_time);
+CREATE UNIQUE INDEX IF NOT EXISTS uk_orders_number ON orders (number);
+CREATE TABLE IF NOT EXISTS cart (
+    member_id INTEGER PRIMARY KEY,
+    attraction_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    time TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS favorite (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    attraction_id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uk_favorite_member_attraction ON favorite (member_id, attraction_id);
+"""
+
+# 索引和 migrations/ 一致，EXPLAIN 檢查才有意義
+REWRITES = [
+    (re.compile(r"^\s*EXPLAIN\s+", re.IGNORECASE), "EXPLAIN QUERY PLAN "),
+    (re.compile(r"NOW\(\)\s*-\s*INTERVAL\s+%s\s+SECOND", re.IGNORECASE), "datetime('now', '-' || %s || ' seconds')"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"ON DUPLICATE KEY UPDATE", re.IGNORECASE), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bVALUES\((\w+)\)", re.IGNORECASE), r"excluded.\1"),
+    (re.compile(r"\bINSERT IGNORE\b", re.IGNORECASE), "INSERT OR IGNORE"),
+    (re.compile(r"\bFOR UPDATE\b", re.IGNORECASE), ""),
+    (re.compile(r"\bNOW\(\)", re.IGNORECASE), "CURRENT_TIMESTAMP"),
+]
+
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+
+_lock = threading.Lock()
+counters = {"connections": 0, "queries": 0}
+queries_by_path = defaultdict(int)  # 多個資料庫檔（primary/replica）各自的查詢數
+
+
+def translate(sql: str):
+    for pattern, replacement in REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def _count(name, path=None):
+    with _lock:
+        counters[name] += 1
+        if path is not None:
+            queries_by_path[path] += 1
+
+
+def _reraise(e):
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        errno = errorcode.ER_DUP_ENTRY if "UNIQUE" in message else errorcode.ER_NO_REFERENCED_ROW_2
+        raise errors.IntegrityError(msg=message, errno=errno) from e
+    raise errors.DatabaseError(msg=message) from e
+
+
+class Cursor:
+    def __init__(self, conn, dictionary=False, path=None):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+        self._path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {d[0]: value for d, value in zip(self._cursor.description, row)}
+
+    def execute(self, sql, params=()):
+        _count("queries", self._path)
+        try:
+            self._cursor.execute(translate(sql), tuple(params or ()))
+        except sqlite3.Error as e:
+            _reraise(e)
+
+    def executemany(self, sql, seq_params):
+        _count("queries", self._path)
+        try:
+            self._cursor.executemany(translate(sql), [tuple(p) for p in seq_params])
+        except sqlite3.Error as e:
+            _reraise(e)
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, path):
+        _count("connections")
+        self._path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False,
+                                     detect_types=sqlite3.PARSE_DECLTYPES)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+
+    def cursor(self, dictionary=False, **kwargs):
+        return Cursor(self._conn, dictionary=dictionary, path=self._path)
+
+    def start_transaction(self):
+        # 直接拿寫入鎖，模擬 InnoDB 的 SELECT ... FOR UPDATE
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._conn.close()
+
+
+def connector(path):
+    """Return a ``connect(**config)`` replacement bound to the SQLite file."""
+    def connect(**config):
+        return Connection(path)
+    return connect
+
+
+def create_database(path, json_path="data/taipei-attractions.json"):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    for record in iter_records(json_path):
+        attraction, images = to_rows(record)
+        conn.execute("INSERT OR REPLACE INTO attractions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", attraction)
+        conn.execute("DELETE FROM images WHERE attraction_id = ?", (attraction[0],))
+        conn.executemany("INSERT INTO images (attraction_id, position, image_url) VALUES (?, ?, ?)", images)
+    conn.commit()
+    conn.close()
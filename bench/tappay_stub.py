@@ -0,0 +1,51 @@
+"""Local stand-in for TapPay's pay-by-prime endpoint, for load-testing checkout.
+
+    TAPPAY_STUB_DELAY_MS=300 uvicorn bench.tappay_stub:app --port 9000
+    TAPPAY_URL=http://127.0.0.1:9000/tpc/payment/pay-by-prime uvicorn app:app
+
+A prime of "fail" is declined; anything else succeeds after the delay.
+Charges made with an order_number can be looked up on the record endpoint.
+"""
+import asyncio
+import os
+from uuid import uuid4
+
+from fastapi import FastAPI, Request
+
+app = FastAPI()
+DELAY_MS = float(os.getenv("TAPPAY_STUB_DELAY_MS", "300"))
+records = {}  # order_number -> trade record
+
+
+@app.post("/tpc/payment/pay-by-prime")
+async def pay_by_prime(request: Request):
+    body = await request.json()
+    await asyncio.sleep(DELAY_MS / 1000)
+
+    if body.get("prime") == "fail":
+        return {"status": 10003, "msg": "Card Error"}
+
+    rec_trade_id = uuid4().hex[:20]
+    if body.get("order_number"):
+        records[body["order_number"]] = {
+            "record_status": 1,
+            "rec_trade_id": rec_trade_id,
+            "order_number": body["order_number"],
+            "amount": body.get("amount")
+        }
+    return {
+        "status": 0,
+        "msg": "Success",
+        "amount": body.get("amount"),
+        "rec_trade_id": rec_trade_id,
+        "bank_transaction_id": uuid4().hex[:20]
+    }
+
+
+@app.post("/tpc/transaction/query")
+async def query_records(request: Request):
+    body = await request.json()
+    record = records.get((body.get("filters") or {}).get("order_number"))
+    if record is None:
+        return {"status": 2, "msg": "No more records", "trade_records": []}
+    return {"status": 0, "msg": "Success", "trade_records": [record]}
@@ -0,0 +1,69 @@
+-- 完整資料表結構；已存在的資料表會略過，讓既有資料庫也能從這一版開始套用
+
+CREATE TABLE IF NOT EXISTS member (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    name VARCHAR(255) NOT NULL,
+    username VARCHAR(255) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL,
+    time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS attractions (
+    id INT NOT NULL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    category VARCHAR(255),
+    description TEXT,
+    address VARCHAR(255),
+    transport TEXT,
+    mrt VARCHAR(255),
+    lat DECIMAL(10, 6) NOT NULL,
+    lng DECIMAL(10, 6) NOT NULL,
+    cover_image VARCHAR(512)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 圖片依 position 排序，position 0 同時存成 attractions.cover_image
+CREATE TABLE IF NOT EXISTS images (
+    attraction_id INT NOT NULL,
+    position INT NOT NULL,
+    image_url VARCHAR(512) NOT NULL,
+    PRIMARY KEY (attraction_id, position),
+    FOREIGN KEY (attraction_id) REFERENCES attractions(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS orders (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    number VARCHAR(20),
+    price INT NOT NULL,
+    attraction_id INT NOT NULL,
+    member_id BIGINT NOT NULL,
+    date DATE NOT NULL,
+    time VARCHAR(20) NOT NULL,
+    name VARCHAR(255),
+    email VARCHAR(255),
+    phone VARCHAR(20),
+    status TINYINT,
+    order_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (attraction_id) REFERENCES attractions(id) ON DELETE CASCADE,
+    FOREIGN KEY (member_id) REFERENCES member(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 購物車：每個會員一列，加入購物車是一個 INSERT ... ON DUPLICATE KEY UPDATE
+CREATE TABLE IF NOT EXISTS cart (
+    member_id BIGINT NOT NULL PRIMARY KEY,
+    attraction_id INT NOT NULL,
+    date DATE NOT NULL,
+    time VARCHAR(20) NOT NULL,
+    price INT NOT NULL,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (attraction_id) REFERENCES attractions(id) ON DELETE CASCADE,
+    FOREIGN KEY (member_id) REFERENCES member(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS favorite (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    attraction_id INT NOT NULL,
+    member_id BIGINT NOT NULL,
+    FOREIGN KEY (attraction_id) REFERENCES attractions(id) ON DELETE CASCADE,
+    FOREIGN KEY (member_id) REFERENCES member(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
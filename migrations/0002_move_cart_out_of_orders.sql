@@ -0,0 +1,13 @@
+-- 舊版把購物車存在 orders（number IS NULL），搬到 cart 後每個會員留最新一筆
+
+INSERT INTO cart (member_id, attraction_id, date, time, price)
+SELECT o.member_id, o.attraction_id, o.date, o.time, o.price
+FROM orders o
+WHERE o.number IS NULL
+  AND o.id = (SELECT MAX(c.id) FROM orders c WHERE c.member_id = o.member_id AND c.number IS NULL)
+ON DUPLICATE KEY UPDATE attraction_id = VALUES(attraction_id), date = VALUES(date),
+    time = VALUES(time), price = VALUES(price);
+
+DELETE FROM orders WHERE number IS NULL;
+
+ALTER TABLE orders MODIFY number VARCHAR(20) NOT NULL;
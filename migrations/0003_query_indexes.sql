@@ -0,0 +1,19 @@
+-- 每個索引對應 app.py 的查詢條件
+-- images.attraction_id 由主鍵 (attraction_id, position) 的前綴涵蓋：fetch_images 的 IN + ORDER BY 直接走主鍵
+-- cart 以 member_id 為主鍵：get_booking_list / add_booking / complete_order / delete_booking 都是主鍵查詢
+
+-- get_order_by_number、set_order_status、fail_order：WHERE number = ?；訂單編號本來就不能重複
+ALTER TABLE orders ADD UNIQUE INDEX uk_orders_number (number);
+
+-- get_booking_list_all：WHERE member_id = ? AND status = 1，附帶 order_time 讓歷史訂單依時間排序不用 filesort
+ALTER TABLE orders ADD INDEX idx_orders_member_status_time (member_id, status, order_time);
+
+-- load_mrt_facet：GROUP BY mrt 走索引，不用掃整張表再排序
+ALTER TABLE attractions ADD INDEX idx_attractions_mrt (mrt);
+
+-- get_favorite_list：WHERE member_id = ?；remove_favorite：WHERE attraction_id = ? AND member_id = ?
+-- 同一會員同一景點只能收藏一次，先清掉舊資料中重複的收藏
+DELETE f1 FROM favorite f1
+JOIN favorite f2
+  ON f1.member_id = f2.member_id AND f1.attraction_id = f2.attraction_id AND f1.id > f2.id;
+ALTER TABLE favorite ADD UNIQUE INDEX uk_favorite_member_attraction (member_id, attraction_id);
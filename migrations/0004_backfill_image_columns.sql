@@ -0,0 +1,39 @@
+-- 舊資料庫的 attractions、images 是手動建立的，0001 的 CREATE TABLE IF NOT EXISTS 會整張略過
+-- 這裡補上後來才加的 attractions.cover_image 與 images.position；新資料庫已經有這些欄位，ADD COLUMN 會被當成已套用略過
+-- 舊的 images 是 (id AUTO_INCREMENT PRIMARY KEY, attraction_id, image_url)：有 id 欄位才做後面的重編與換主鍵
+-- 條件式的 DDL 用 PREPARE 執行，新資料庫（或已經換好主鍵的舊資料庫）走 DO 0 什麼都不做
+
+ALTER TABLE images ADD COLUMN position INT NOT NULL DEFAULT 0;
+
+SET @legacy_images = (
+    SELECT COUNT(*) FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = 'images' AND column_name = 'id'
+);
+
+-- images.position：舊資料依 id（原本寫入的順序）編號，每個景點從 0 開始
+SET @backfill = IF(@legacy_images > 0,
+    'UPDATE images i
+     JOIN (
+         SELECT id, ROW_NUMBER() OVER (PARTITION BY attraction_id ORDER BY id) - 1 AS seq
+         FROM images
+     ) numbered ON numbered.id = i.id
+     SET i.position = numbered.seq',
+    'DO 0');
+PREPARE backfill FROM @backfill;
+EXECUTE backfill;
+DEALLOCATE PREPARE backfill;
+
+-- 主鍵換成 fetch_images 排序用的 (attraction_id, position)；id 是 AUTO_INCREMENT，必須和舊主鍵一起拿掉
+SET @replace_key = IF(@legacy_images > 0,
+    'ALTER TABLE images DROP PRIMARY KEY, DROP COLUMN id, ADD PRIMARY KEY (attraction_id, position)',
+    'DO 0');
+PREPARE replace_key FROM @replace_key;
+EXECUTE replace_key;
+DEALLOCATE PREPARE replace_key;
+
+-- attractions.cover_image：第一張圖
+ALTER TABLE attractions ADD COLUMN cover_image VARCHAR(512);
+UPDATE attractions a
+JOIN images i ON i.attraction_id = a.id AND i.position = 0
+SET a.cover_image = i.image_url
+WHERE a.cover_image IS NULL;
@@ -1,4 +1,5 @@
 let nextPage = 0;
+let nextCursor = null;
 let isLoading = false;
 let currentKeyword = null; 
 
@@ -90,9 +91,10 @@ async function fetchAttractions() {
     isLoading = true;
 
     try {
-        const url = currentKeyword
+        let url = currentKeyword
             ? `/api/attractions?page=${nextPage}&keyword=${encodeURIComponent(currentKeyword)}`
             : `/api/attractions?page=${nextPage}`;
+        if (nextCursor) url += `&cursor=${encodeURIComponent(nextCursor)}`;
 
         const response = await fetch(url);
         const data = await response.json();
@@ -102,11 +104,12 @@ async function fetchAttractions() {
             return;
         }
 
-        const favoriteIds = await getFavoriteIds();
+        const favoriteIds = await getFavoriteIds(data.data.map(item => item.id));
 
         loadCard(data.data, favoriteIds);
 
         nextPage = data.nextPage ?? (nextPage + 1);
+        nextCursor = data.nextCursor ?? null;
     } catch (error) {
         console.error("⚠️ Fetch Attractions Error:", error);
     } finally {
@@ -115,14 +118,16 @@ async function fetchAttractions() {
     }
 }
 
-async function getFavoriteIds() {
+async function getFavoriteIds(ids) {
     const token = localStorage.getItem("token");
-    if (!token) return [];
+    if (!token || ids.length === 0) return [];
   
     try {
-      const res    = await fetch("/api/favorite", { headers: { Authorization: `Bearer ${token}` } });
+      // 只問這一頁的景點是否已收藏
+      const res    = await fetch(`/api/favorite/contains?ids=${ids.join(",")}`, { headers: { Authorization: `Bearer ${token}` } });
       const result = await res.json();
-      return extractFavoriteIds(result.data);
+      if (!Array.isArray(result.data)) return [];
+      return ids.filter((id, i) => result.data[i]);
     } catch (err) {
       console.warn("❌ 無法取得 favorite 列表", err);
       return [];
@@ -210,6 +215,7 @@ function setupSearchEvents() {
         } else {
             currentKeyword = keyword;
             nextPage = 0;
+            nextCursor = null;
             sentinelObserver.observe(sentinel);
             fetchAttractions();
         }
@@ -230,6 +236,7 @@ function hideLoading() {
 function resetAndFetch() {
     currentKeyword = null;
     nextPage = 0;
+    nextCursor = null;
     sentinelObserver.observe(sentinel);
     fetchAttractions();
 }
@@ -897,7 +904,10 @@ document.addEventListener("click", (e) => {
     }
   });
 
-  async function fetchThankyou() {
+  // 付款處理中時的輪詢間隔與上限：間隔逐次拉長，最多查 THANKYOU_MAX_POLLS 次
+  const THANKYOU_MAX_POLLS = 20;
+
+  async function fetchThankyou(attempt = 0) {
     const token = localStorage.getItem("token");
     if (!token) return;
   
@@ -922,6 +932,29 @@ document.addEventListener("click", (e) => {
         document.querySelector("footer")?.classList.add("no-booking");
         return;
       }
+
+      // status 2：付款處理中；status 4：扣款結果確認中（和 TapPay 對帳）。稍後再查一次，超過次數就請使用者到會員中心查看
+      if (orderData.data.status === 2 || orderData.data.status === 4) {
+        if (attempt >= THANKYOU_MAX_POLLS) {
+          orderContainer.innerHTML = `<h3>付款結果確認中，請稍後到會員中心查看訂單狀態</h3>`;
+          document.querySelector("footer")?.classList.add("no-booking");
+          return;
+        }
+        orderContainer.innerHTML = orderData.data.status === 4
+          ? `<h3>付款結果確認中，請勿重複付款...</h3>`
+          : `<h3>付款處理中，請稍候...</h3>`;
+        setTimeout(() => {
+          orderContainer.innerHTML = "";
+          fetchThankyou(attempt + 1);
+        }, Math.min(1000 * 1.5 ** attempt, 10000));
+        return;
+      }
+
+      if (orderData.data.status === 3) {
+        orderContainer.innerHTML = `<h3>付款失敗，行程已放回預定行程，請重新付款</h3>`;
+        document.querySelector("footer")?.classList.add("no-booking");
+        return;
+      }
   
       const orderDiv = document.createElement("div");
       orderDiv.className = "headline-container";
@@ -1234,12 +1267,11 @@ async function setupAttractionHeartBtn(attractionId) {
     if (!token) return;
   
     try {
-      const res    = await fetch("/api/favorite", { headers: { Authorization: `Bearer ${token}` } });
+      const res    = await fetch(`/api/favorite/contains?ids=${attractionId}`, { headers: { Authorization: `Bearer ${token}` } });
       const result = await res.json();
-      const ids    = extractFavoriteIds(result.data);
   
       
-      if (ids.includes(attractionId)) btn.classList.add("active");
+      if (Array.isArray(result.data) && result.data[0]) btn.classList.add("active");
   
       
       btn.addEventListener("click", async e => {
@@ -1264,26 +1296,6 @@ async function setupAttractionHeartBtn(attractionId) {
     }
   }
 
-  function extractFavoriteIds(raw) {
-    if (!Array.isArray(raw)) return [];
-    return raw
-      .map(item => {
-        if (typeof item === "number" || typeof item === "string") {
-          return Number(item);
-        }
-        if (item && typeof item === "object") {
-          
-          return Number(
-            item.id ??
-            item.attraction_id ??
-            item.attractionId
-          );
-        }
-        return NaN;
-      })
-      .filter(n => Number.isFinite(n));
-  }
-
   function setupFavorite() {
     const token = localStorage.getItem("token");
     if (!token) return;
@@ -0,0 +1,295 @@
+import asyncio
+import contextvars
+import functools
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+import mysql.connector
+
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Process-wide MySQL connection pool.
+
+    Keeps up to ``size`` idle connections around, allows ``max_overflow``
+    extra connections under load, pings connections on checkout and
+    recycles them once they are older than ``recycle`` seconds.
+
+    With ``metrics`` (a ``utils.metrics.Metrics``) every checkout's wait is
+    reported and connections are handed out wrapped so their statements
+    are timed.
+    """
+
+    def __init__(self, config: dict, size: int = 5, max_overflow: int = 10,
+                 timeout: float = 30, recycle: int = 3600, pre_ping: bool = True,
+                 connector=None, metrics=None):
+        self.config = config
+        self.connector = connector or mysql.connector.connect
+        self.metrics = metrics
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._idle = deque()  # (conn, created_at)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size + max_overflow)
+        self._created_at = {}
+
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._opened = 0
+        self._closed = 0
+        self._recycled = 0
+        self._failed_pings = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _open(self):
+        conn = self.connector(**self.config)
+        with self._lock:
+            self._opened += 1
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _close(self, conn):
+        self._created_at.pop(id(conn), None)
+        with self._lock:
+            self._closed += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, created_at = self._idle.pop()
+
+            if self.recycle and time.monotonic() - created_at > self.recycle:
+                with self._lock:
+                    self._recycled += 1
+                self._close(conn)
+                continue
+
+            if self.pre_ping:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    with self._lock:
+                        self._failed_pings += 1
+                    self._close(conn)
+                    continue
+
+            return conn
+
+        return self._open()
+
+    def _checkin(self, conn, broken: bool = False):
+        if not broken:
+            try:
+                # 結束未 commit 的交易，避免下一個使用者拿到舊的 snapshot
+                conn.rollback()
+            except Exception:
+                broken = True
+
+        if broken:
+            self._close(conn)
+            return
+
+        created_at = self._created_at.get(id(conn), time.monotonic())
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, created_at))
+                return
+        self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(f"no connection available within {self.timeout}s")
+
+        waited = time.monotonic() - started
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        if self.metrics is not None:
+            self.metrics.observe_acquire(time.monotonic() - started)
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        broken = False
+        try:
+            yield conn if self.metrics is None else self.metrics.wrap(conn)
+        except mysql.connector.errors.OperationalError:
+            broken = True
+            raise
+        except mysql.connector.errors.InterfaceError:
+            broken = True
+            raise
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._checkin(conn, broken=broken)
+            self._slots.release()
+
+    @property
+    def in_use(self):
+        return self._in_use
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "opened": self._opened,
+                "closed": self._closed,
+                "recycled": self._recycled,
+                "failed_pings": self._failed_pings,
+                "wait_total_ms": round(self._wait_total * 1000, 3),
+                "wait_avg_ms": round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+    def dispose(self):
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._close(conn)
+
+
+class ReplicaRouter:
+    """Sends read-only work to replica pools and everything else to the primary.
+
+    ``connection(read_only=True)`` picks a healthy replica, either
+    ``round_robin`` or ``least_connections`` (fewest checked-out
+    connections). A replica that fails to hand out a connection is marked
+    unhealthy for ``cooldown`` seconds and the read falls back to the
+    primary. Only send reads here that tolerate replication lag; reads that
+    must see the caller's own writes should use the primary pool directly.
+    With no replicas every read goes to the primary.
+    """
+
+    def __init__(self, primary: ConnectionPool, replicas=(), strategy: str = "round_robin",
+                 cooldown: float = 10):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"unknown replica strategy: {strategy}")
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.cooldown = cooldown
+
+        self._unhealthy_until = [0.0] * len(self.replicas)
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._routed = {"primary": 0, "replica": 0}
+        self._failovers = 0
+
+    def _healthy(self):
+        now = time.monotonic()
+        return [i for i, until in enumerate(self._unhealthy_until) if until <= now]
+
+    def _mark_unhealthy(self, index):
+        with self._lock:
+            self._unhealthy_until[index] = time.monotonic() + self.cooldown
+            self._failovers += 1
+
+    def _choose(self, read_only):
+        healthy = self._healthy() if read_only else []
+        if healthy:
+            if self.strategy == "least_connections":
+                index = min(healthy, key=lambda i: self.replicas[i].in_use)
+            else:
+                index = healthy[next(self._next) % len(healthy)]
+            with self._lock:
+                self._routed["replica"] += 1
+            return index
+        with self._lock:
+            self._routed["primary"] += 1
+        return None
+
+    @contextmanager
+    def connection(self, read_only: bool = False):
+        index = self._choose(read_only)
+        with ExitStack() as stack:
+            if index is None:
+                conn = stack.enter_context(self.primary.connection())
+            else:
+                try:
+                    conn = stack.enter_context(self.replicas[index].connection())
+                except (mysql.connector.errors.Error, PoolTimeoutError):
+                    # replica 連不上：暫停使用一段時間，這次改讀 primary
+                    self._mark_unhealthy(index)
+                    index = None
+                    conn = stack.enter_context(self.primary.connection())
+            try:
+                yield conn
+            except (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError):
+                if index is not None:
+                    self._mark_unhealthy(index)
+                raise
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "routed": dict(self._routed),
+                "failovers": self._failovers,
+                "replicas": [
+                    {"replica": i, "healthy": until <= now, **pool.stats()}
+                    for i, (pool, until) in enumerate(zip(self.replicas, self._unhealthy_until))
+                ],
+            }
+
+    def dispose(self):
+        for pool in self.replicas:
+            pool.dispose()
+
+
+class DBRunner:
+    """Runs blocking DB helpers on a bounded thread pool so ``async def``
+    routes never block the event loop.
+
+    Size it to the pool's ``size + max_overflow`` so a worker thread never
+    waits on a connection slot. The caller's context variables (the request
+    profile) are carried over to the worker thread.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+
+    async def __call__(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, functools.partial(context.run, fn, *args, **kwargs))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
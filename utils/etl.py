@@ -0,0 +1,209 @@
+"""Load data/taipei-attractions.json into the attractions and images tables.
+
+    python -m utils.etl data/taipei-attractions.json [--batch-size 500] [--notify http://127.0.0.1:8000]
+
+Records are parsed one at a time, so memory stays flat no matter how large
+the catalog is. Everything is written in one transaction, and re-runs upsert
+the attractions and replace their images instead of duplicating rows.
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+import mysql.connector
+import requests
+from dotenv import load_dotenv
+
+IMAGE_URL_RE = re.compile(r"https?://.*?(?=https?://|$)", re.IGNORECASE)
+IMAGE_EXTENSIONS = (".jpg", ".png")
+
+UPSERT_ATTRACTIONS = """
+    INSERT INTO attractions
+        (id, name, category, description, address, transport, mrt, lat, lng, cover_image)
+    VALUES
+        (%s, %s,   %s,       %s,          %s,      %s,        %s,  %s,  %s,  %s)
+    ON DUPLICATE KEY UPDATE
+        name = VALUES(name), category = VALUES(category),
+        description = VALUES(description), address = VALUES(address),
+        transport = VALUES(transport), mrt = VALUES(mrt),
+        lat = VALUES(lat), lng = VALUES(lng), cover_image = VALUES(cover_image)
+"""
+
+INSERT_IMAGES = """
+    INSERT INTO images (attraction_id, position, image_url) VALUES (%s, %s, %s)
+"""
+
+
+def iter_records(path: str, chunk_size: int = 64 * 1024):
+    """Yield each object of the ``results`` array (or of a top-level array)."""
+    decoder = json.JSONDecoder()
+
+    with open(path, encoding="utf-8") as f:
+        buf = ""
+        eof = False
+
+        def fill():
+            nonlocal buf, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buf += chunk
+
+        # 找到陣列開頭：{"result": {..., "results": [ 或直接是 [
+        while True:
+            stripped = buf.lstrip()
+            if stripped.startswith("["):
+                pos = len(buf) - len(stripped) + 1
+                break
+            key = buf.find('"results"')
+            if key != -1:
+                bracket = buf.find("[", key)
+                if bracket != -1:
+                    pos = bracket + 1
+                    break
+            if eof:
+                raise ValueError(f"{path}: no results array found")
+            fill()
+
+        while True:
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                fill()
+
+            if pos >= len(buf) or buf[pos] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+
+            yield record
+            buf = buf[end:]
+            pos = 0
+
+
+def split_images(file_field: str):
+    urls = IMAGE_URL_RE.findall(file_field or "")
+    return [url for url in urls if url.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def to_rows(record: dict):
+    attraction_id = int(record["_id"])
+    urls = split_images(record.get("file"))
+    attraction = (
+        attraction_id,
+        record["name"],
+        record.get("CAT"),
+        record.get("description"),
+        record.get("address"),
+        record.get("direction"),
+        record.get("MRT") or None,
+        float(record["latitude"]),
+        float(record["longitude"]),
+        urls[0] if urls else None,
+    )
+    images = [(attraction_id, position, url) for position, url in enumerate(urls)]
+    return attraction, images
+
+
+def write_batch(cursor, records):
+    attractions = []
+    images = []
+    for record in records:
+        attraction, attraction_images = to_rows(record)
+        attractions.append(attraction)
+        images.extend(attraction_images)
+
+    cursor.executemany(UPSERT_ATTRACTIONS, attractions)
+
+    ids = [row[0] for row in attractions]
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(f"DELETE FROM images WHERE attraction_id IN ({placeholders})", ids)
+    if images:
+        cursor.executemany(INSERT_IMAGES, images)
+
+    return len(attractions), len(images)
+
+
+def load(path: str, config: dict, batch_size: int = 500):
+    started = time.perf_counter()
+    attraction_count = 0
+    image_count = 0
+
+    conn = mysql.connector.connect(**config)
+    try:
+        conn.start_transaction()
+        with conn.cursor() as cursor:
+            batch = []
+            for record in iter_records(path):
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    a, i = write_batch(cursor, batch)
+                    attraction_count += a
+                    image_count += i
+                    batch = []
+            if batch:
+                a, i = write_batch(cursor, batch)
+                attraction_count += a
+                image_count += i
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "attractions": attraction_count,
+        "images": image_count,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round((attraction_count + image_count) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def notify(base_url: str):
+    # 通知執行中的 app 重新整理景點快取
+    r = requests.post(
+        base_url.rstrip("/") + "/api/catalog/refresh",
+        headers={"X-Refresh-Token": os.getenv("CATALOG_REFRESH_TOKEN") or ""},
+        timeout=10
+    )
+    r.raise_for_status()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Load attractions JSON into MySQL")
+    parser.add_argument("path", nargs="?", default="data/taipei-attractions.json")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--notify", help="base URL of a running app to refresh after loading")
+    args = parser.parse_args()
+
+    config = {
+        "host": os.getenv("DB_HOST"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "database": os.getenv("DB_NAME")
+    }
+
+    result = load(args.path, config, batch_size=args.batch_size)
+    print(f"loaded {result['attractions']} attractions, {result['images']} images "
+          f"in {result['seconds']}s ({result['rows_per_second']} rows/s)")
+
+    if args.notify:
+        notify(args.notify)
+        print(f"refreshed catalog on {args.notify}")
+
+
+if __name__ == "__main__":
+    main()
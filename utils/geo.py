@@ -0,0 +1,123 @@
+import heapq
+import math
+import struct
+from array import array
+
+EARTH_RADIUS_M = 6371008.8
+COUNT = struct.Struct("<Q")
+
+
+def to_xyz(lat: float, lng: float):
+    # 轉成單位球面上的點：直線（弦）距離和球面距離單調對應，不用處理經度跨越 ±180
+    phi = math.radians(lat)
+    theta = math.radians(lng)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(theta), cos_phi * math.sin(theta), math.sin(phi))
+
+
+def chord_to_meters(chord: float):
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, chord / 2))
+
+
+def meters_to_chord(meters: float):
+    return 2 * math.sin(min(math.pi / 2, meters / (2 * EARTH_RADIUS_M)))
+
+
+class GeoIndex:
+    """Static KD-tree over the attractions' coordinates.
+
+    Points live on the unit sphere in 3D, so nearest-neighbour and radius
+    queries only visit the branches that can still hold a closer point
+    instead of computing a haversine distance for every row. The tree is
+    implicit: the median of each ``[lo, hi)`` range sits at its middle, with
+    the left subtree before it and the right subtree after.
+
+    ``pack()`` serializes the tree as flat int64 ids and float64 x, y, z
+    triples; ``from_buffer()`` queries such a buffer in place, so workers
+    sharing a snapshot do not each hold a copy.
+    """
+
+    def __init__(self, rows):
+        points = []
+        for row in rows:
+            if row.get("lat") is None or row.get("lng") is None:
+                continue
+            points.append((row["id"], to_xyz(float(row["lat"]), float(row["lng"]))))
+        self._ids = array("q")
+        self._xyz = array("d")  # 每個點連續三個值 x, y, z
+        self._build(points, 0)
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        view = memoryview(buffer)
+        (count,) = COUNT.unpack_from(view, 0)
+        ids_end = COUNT.size + 8 * count
+        index = cls.__new__(cls)
+        index._ids = view[COUNT.size:ids_end].cast("q")
+        index._xyz = view[ids_end:ids_end + 24 * count].cast("d")
+        return index
+
+    def pack(self):
+        return COUNT.pack(len(self._ids)) + bytes(self._ids) + bytes(self._xyz)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _build(self, points, depth):
+        # 依序放進 _ids/_xyz：左子樹、中位數、右子樹
+        if not points:
+            return
+        axis = depth % 3
+        points.sort(key=lambda p: p[1][axis])
+        mid = len(points) // 2
+        self._build(points[:mid], depth + 1)
+        self._ids.append(points[mid][0])
+        self._xyz.extend(points[mid][1])
+        self._build(points[mid + 1:], depth + 1)
+
+    def _search(self, target, bound, visit):
+        """Walk the tree, calling ``visit(index, squared chord)`` for every
+        point whose branch can be within ``bound()`` (squared chord)."""
+        xyz = self._xyz
+        stack = [(0, len(self._ids), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            base = 3 * mid
+            dx = xyz[base] - target[0]
+            dy = xyz[base + 1] - target[1]
+            dz = xyz[base + 2] - target[2]
+            visit(mid, dx * dx + dy * dy + dz * dz)
+
+            axis = depth % 3
+            diff = target[axis] - xyz[base + axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            # 先推遠的那一半，之後再檢查是否還可能更近
+            if diff * diff <= bound():
+                stack.append((far[0], far[1], depth + 1))
+            stack.append((near[0], near[1], depth + 1))
+
+    def nearest(self, lat: float, lng: float, k: int = 10, radius: float = None):
+        """Return up to ``k`` ``(id, meters)`` pairs, nearest first,
+        optionally limited to ``radius`` meters."""
+        if k <= 0 or not self._ids:
+            return []
+        limit = meters_to_chord(radius) ** 2 if radius is not None else math.inf
+        heap = []  # (-squared chord, index)，最遠的在頂端
+
+        def bound():
+            return -heap[0][0] if len(heap) == k else limit
+
+        def visit(index, d2):
+            if d2 > limit:
+                return
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, index))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, index))
+
+        self._search(to_xyz(lat, lng), bound, visit)
+        return [(self._ids[i], chord_to_meters(math.sqrt(-d2))) for d2, i in sorted(heap, reverse=True)]
+
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger("app.jobs")
+
+
+class JobQueue:
+    """Bounded asyncio queue drained by a fixed number of worker tasks.
+
+    ``handler`` is an ``async def handler(job)``; it can wrap each step in
+    ``async with queue.stage("name")`` to get per-stage timings in stats().
+    ``stop(timeout)`` stops accepting jobs and lets the workers finish what
+    is queued before cancelling them.
+    """
+
+    def __init__(self, handler, workers: int = 4, maxsize: int = 100):
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queue = None
+        self._tasks = []
+        self._stages = {}  # name -> [count, total, max]
+        self._submitted = 0
+        self._processed = 0
+        self._failed = 0
+        self._busy = 0
+        self._closing = False
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._closing = False
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = None):
+        # 先不收新工作，等佇列裡和做到一半的工作完成（最多 timeout 秒），逾時才取消 worker
+        self._closing = True
+        if timeout and self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("job queue not drained within %ss: %d queued, %d running",
+                               timeout, self._queue.qsize(), self._busy)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    def submit(self, job):
+        # 佇列滿了或正在關閉時丟 asyncio.QueueFull，由呼叫端決定怎麼回應
+        if self._closing:
+            raise asyncio.QueueFull()
+        self._queue.put_nowait((job, time.perf_counter()))
+        self._submitted += 1
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - started)
+
+    def _record(self, name, elapsed):
+        stage = self._stages.setdefault(name, [0, 0.0, 0.0])
+        stage[0] += 1
+        stage[1] += elapsed
+        stage[2] = max(stage[2], elapsed)
+
+    async def _worker(self):
+        while True:
+            job, queued_at = await self._queue.get()
+            self._record("queued", time.perf_counter() - queued_at)
+            self._busy += 1
+            try:
+                await self.handler(job)
+                self._processed += 1
+            except Exception:
+                self._failed += 1
+                logger.exception("job failed: %r", job)
+            finally:
+                self._busy -= 1
+                self._queue.task_done()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "busy": self._busy,
+            "depth": self._queue.qsize() if self._queue else 0,
+            "maxsize": self.maxsize,
+            "submitted": self._submitted,
+            "processed": self._processed,
+            "failed": self._failed,
+            "stages": {
+                name: {
+                    "count": count,
+                    "avg_ms": round(total * 1000 / count, 3) if count else 0.0,
+                    "max_ms": round(peak * 1000, 3),
+                }
+                for name, (count, total, peak) in self._stages.items()
+            },
+        }
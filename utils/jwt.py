@@ -2,6 +2,10 @@ import jwt
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import os
+import hashlib
+import time
+import threading
+from utils.cache import TTLCache
 
 load_dotenv()
 
@@ -23,3 +27,55 @@ def decode_access_token(token: str):
         return None
     except jwt.InvalidTokenError:
         return None
+
+
+# 驗證過的 token 快取到 exp 為止，key 用 token 的 sha256，避免每個請求都重算簽章
+token_cache = TTLCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")))
+revoked_tokens = TTLCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")))
+verify_stats = {"count": 0, "seconds": 0.0}
+_stats_lock = threading.Lock()
+
+def _token_digest(token: str):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def verify_access_token(token: str):
+    digest = _token_digest(token)
+    if revoked_tokens.get(digest):
+        return None
+
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
+
+    started = time.perf_counter()
+    payload = decode_access_token(token)
+    elapsed = time.perf_counter() - started
+    # run_db 的多個執行緒會同時驗證，+= 不是原子操作
+    with _stats_lock:
+        verify_stats["count"] += 1
+        verify_stats["seconds"] += elapsed
+
+    if payload and "exp" in payload:
+        ttl = payload["exp"] - time.time()
+        if ttl > 0:
+            token_cache.set(digest, payload, ttl=ttl)
+    return payload
+
+def revoke_access_token(token: str):
+    digest = _token_digest(token)
+    payload = token_cache.get(digest) or decode_access_token(token)
+    token_cache.invalidate(digest)
+    ttl = payload["exp"] - time.time() if payload and "exp" in payload else None
+    if ttl is None or ttl > 0:
+        revoked_tokens.set(digest, True, ttl=ttl)
+
+def token_cache_stats():
+    with _stats_lock:
+        count = verify_stats["count"]
+        seconds = verify_stats["seconds"]
+    return {
+        **token_cache.stats(),
+        "revoked": len(revoked_tokens),
+        "verifications": count,
+        "verify_avg_ms": round(seconds * 1000 / count, 3) if count else 0.0,
+    }
@@ -0,0 +1,46 @@
+"""Leveled logging that is safe to call from the event loop.
+
+Handlers on the root logger are replaced by a ``QueueHandler``, so a log
+call only puts the record on a queue. A ``QueueListener`` thread formats the
+records and writes them to stderr.
+"""
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+# httpx 每個請求都記一筆 INFO，只保留警告以上
+QUIET_LOGGERS = ("httpx", "httpcore")
+
+_listener = None
+
+
+def setup_logging(level: str = "INFO"):
+    """Install the queue handler once and return the running listener."""
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+    if _listener is not None:
+        return _listener
+
+    records = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter(FORMAT))
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(records))
+
+    _listener = QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,379 @@
+"""Per-request profiling, query fingerprints and Prometheus-style metrics.
+
+``Metrics.wrap(conn)`` returns a connection whose cursors time every
+statement and count the rows it touched. The pool reports how long each
+checkout waited, and ``TapPayClient`` reports every pay-by-prime call.
+``MetricsMiddleware`` gives each request a ``RequestProfile`` through a
+context variable. It adds those numbers up, sends them back as a
+``Server-Timing`` header, and records per-route latency.
+
+Recording a query costs two ``perf_counter()`` calls, a context variable
+lookup, an LRU-cached fingerprint and one short lock, so it can stay on in
+production.
+"""
+import bisect
+import contextvars
+import logging
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+logger = logging.getLogger("app.metrics")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_FINGERPRINTS = 500
+
+_WS_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%s|\?")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+_profile = contextvars.ContextVar("request_profile", default=None)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str):
+    """Normalize a statement so queries that differ only in literals or
+    ``IN (...)`` length share one fingerprint."""
+    sql = _WS_RE.sub(" ", sql).strip()
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _PLACEHOLDER_RE.sub("?", sql)
+    return _IN_LIST_RE.sub("(...)", sql)
+
+
+def current_profile():
+    return _profile.get()
+
+
+class RequestProfile:
+    __slots__ = ("queries", "rows", "db_acquire", "db_exec", "tappay_calls", "tappay")
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.db_acquire = 0.0
+        self.db_exec = 0.0
+        self.tappay_calls = 0
+        self.tappay = 0.0
+
+    def server_timing(self, total: float):
+        parts = [
+            f'db;dur={self.db_exec * 1000:.2f};desc="{self.queries} queries, {self.rows} rows"',
+            f"db-acquire;dur={self.db_acquire * 1000:.2f}",
+        ]
+        if self.tappay_calls:
+            parts.append(f"tappay;dur={self.tappay * 1000:.2f}")
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str = ""):
+        sep = "," if labels else ""
+        cumulative = 0
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "max", "rows")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+
+class InstrumentedCursor:
+    """Cursor proxy that times each statement, including the fetches that
+    follow it. The statement is recorded on the next ``execute`` or on close."""
+
+    __slots__ = ("_cursor", "_metrics", "_sql", "_elapsed", "_rows")
+
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._sql = None
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _flush(self):
+        if self._sql is not None:
+            self._metrics.observe_query(self._sql, self._elapsed, self._rows)
+            self._sql = None
+
+    def _run(self, method, sql, args, kwargs):
+        self._flush()
+        started = time.perf_counter()
+        try:
+            return method(sql, *args, **kwargs)
+        finally:
+            self._sql = sql
+            self._elapsed = time.perf_counter() - started
+            rowcount = self._cursor.rowcount
+            self._rows = rowcount if rowcount and rowcount > 0 else 0
+
+    def execute(self, sql, *args, **kwargs):
+        return self._run(self._cursor.execute, sql, args, kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        return self._run(self._cursor.executemany, sql, args, kwargs)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._elapsed += time.perf_counter() - started
+        if row is not None:
+            self._rows += 1
+        return row
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._elapsed += time.perf_counter() - started
+        self._rows += len(rows)
+        return rows
+
+    def close(self):
+        self._flush()
+        return self._cursor.close()
+
+
+class InstrumentedConnection:
+    __slots__ = ("_conn", "_metrics")
+
+    def __init__(self, conn, metrics):
+        self._conn = conn
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._metrics)
+
+
+class Metrics:
+    """Process-wide registry.
+
+    Statements slower than ``slow_query_ms`` and requests slower than
+    ``slow_request_ms`` are logged at WARNING. The most recent
+    ``slow_log_size`` slow queries are also kept for ``slow_queries()``.
+    """
+
+    def __init__(self, slow_query_ms: float = 200, slow_request_ms: float = 1000,
+                 slow_log_size: int = 100):
+        self.slow_query = slow_query_ms / 1000
+        self.slow_request = slow_request_ms / 1000
+
+        self._lock = threading.Lock()
+        self._requests = {}          # (method, route, status) -> count
+        self._request_seconds = {}   # route -> Histogram
+        self._queries = {}           # fingerprint -> QueryStats
+        self._query_seconds = Histogram()
+        self._acquire_seconds = Histogram()
+        self._tappay_seconds = Histogram()
+        self._tappay_requests = {"ok": 0, "error": 0}
+        self._slow_queries = deque(maxlen=slow_log_size)
+        self._gauges = []            # (prefix, fn returning {name: number})
+
+    def wrap(self, conn):
+        return InstrumentedConnection(conn, self)
+
+    def add_gauges(self, prefix: str, fn):
+        self._gauges.append((prefix, fn))
+
+    def observe_acquire(self, seconds: float):
+        profile = _profile.get()
+        if profile is not None:
+            profile.db_acquire += seconds
+        with self._lock:
+            self._acquire_seconds.observe(seconds)
+
+    def observe_query(self, sql: str, seconds: float, rows: int):
+        fp = fingerprint(sql)
+        profile = _profile.get()
+        if profile is not None:
+            profile.queries += 1
+            profile.rows += rows
+            profile.db_exec += seconds
+
+        with self._lock:
+            stats = self._queries.get(fp)
+            if stats is None:
+                if len(self._queries) >= MAX_FINGERPRINTS:
+                    fp = "other"
+                stats = self._queries.setdefault(fp, QueryStats())
+            stats.count += 1
+            stats.seconds += seconds
+            stats.rows += rows
+            if seconds > stats.max:
+                stats.max = seconds
+            self._query_seconds.observe(seconds)
+
+        if seconds >= self.slow_query:
+            entry = {"fingerprint": fp, "ms": round(seconds * 1000, 3), "rows": rows, "time": time.time()}
+            with self._lock:
+                self._slow_queries.append(entry)
+            logger.warning("slow query %.1fms rows=%d: %s", seconds * 1000, rows, fp)
+
+    def observe_tappay(self, seconds: float, ok: bool):
+        profile = _profile.get()
+        if profile is not None:
+            profile.tappay_calls += 1
+            profile.tappay += seconds
+        with self._lock:
+            self._tappay_seconds.observe(seconds)
+            self._tappay_requests["ok" if ok else "error"] += 1
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, profile):
+        with self._lock:
+            key = (method, route, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            histogram = self._request_seconds.get(route)
+            if histogram is None:
+                histogram = self._request_seconds[route] = Histogram()
+            histogram.observe(seconds)
+
+        if seconds >= self.slow_request:
+            logger.warning("slow request %s %s %d %.1fms: %s",
+                           method, route, status, seconds * 1000, profile.server_timing(seconds))
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self._slow_queries)
+
+    def top_queries(self, limit: int = 20):
+        with self._lock:
+            items = [(fp, s.count, s.seconds, s.max, s.rows) for fp, s in self._queries.items()]
+        items.sort(key=lambda item: item[2], reverse=True)
+        return [
+            {"fingerprint": fp, "count": count, "total_ms": round(seconds * 1000, 3),
+             "avg_ms": round(seconds * 1000 / count, 3), "max_ms": round(max_ * 1000, 3), "rows": rows}
+            for fp, count, seconds, max_, rows in items[:limit]
+        ]
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{_label(route)}",status="{status}"}} {count}')
+
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for route, histogram in sorted(self._request_seconds.items()):
+                lines.extend(histogram.render("http_request_duration_seconds", f'route="{_label(route)}"'))
+
+            lines.append("# TYPE db_query_duration_seconds histogram")
+            lines.extend(self._query_seconds.render("db_query_duration_seconds"))
+            lines.append("# TYPE db_pool_acquire_seconds histogram")
+            lines.extend(self._acquire_seconds.render("db_pool_acquire_seconds"))
+
+            lines.append("# TYPE db_statement_calls_total counter")
+            lines.append("# TYPE db_statement_seconds_total counter")
+            lines.append("# TYPE db_statement_rows_total counter")
+            for fp, stats in sorted(self._queries.items()):
+                label = f'fingerprint="{_label(fp)}"'
+                lines.append(f"db_statement_calls_total{{{label}}} {stats.count}")
+                lines.append(f"db_statement_seconds_total{{{label}}} {stats.seconds:.6f}")
+                lines.append(f"db_statement_rows_total{{{label}}} {stats.rows}")
+
+            lines.append("# TYPE tappay_request_duration_seconds histogram")
+            lines.extend(self._tappay_seconds.render("tappay_request_duration_seconds"))
+            lines.append("# TYPE tappay_requests_total counter")
+            for outcome, count in self._tappay_requests.items():
+                lines.append(f'tappay_requests_total{{outcome="{outcome}"}} {count}')
+
+            gauges = list(self._gauges)
+
+        for prefix, fn in gauges:
+            for name, value in fn().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{name} gauge")
+                    lines.append(f"{prefix}_{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware that profiles each HTTP request.
+
+    The ``route`` label is the matched path template (``/api/attraction/{id}``),
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, metrics: Metrics, server_timing: bool = True):
+        self.app = app
+        self.metrics = metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    value = profile.server_timing(time.perf_counter() - started)
+                    message = {**message, "headers": [*message.get("headers", ()),
+                                                      (b"server-timing", value.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _profile.reset(token)
+            route = scope.get("route")
+            label = getattr(route, "path", None) or "unmatched"
+            self.metrics.observe_request(scope["method"], label, status,
+                                         time.perf_counter() - started, profile)
@@ -0,0 +1,164 @@
+"""Apply the versioned SQL migrations in migrations/ to MySQL.
+
+    python -m utils.migrate              # apply everything that is pending
+    python -m utils.migrate --status     # list applied and pending versions
+    python -m utils.migrate --explain    # fail if a hot query does a full scan
+
+Files are named ``NNNN_description.sql`` and applied in version order.
+Every applied version is recorded in ``schema_migrations`` together with a
+checksum of the file, and the runner refuses to continue if an applied
+file was edited afterwards. "Already exists" errors are skipped, so a
+database that was created by hand from the old ``sql`` notes can adopt the
+migrations from version 0001.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+from dataclasses import dataclass
+
+import mysql.connector
+from dotenv import load_dotenv
+from mysql.connector import errorcode
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "migrations")
+MIGRATION_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# 已存在的資料表、索引、欄位：視為已套用
+# 主鍵不在其中：已有另一個主鍵不代表是 migration 要的那個，要換主鍵的 migration 自己 DROP PRIMARY KEY
+ALREADY_APPLIED = {
+    errorcode.ER_TABLE_EXISTS_ERROR,
+    errorcode.ER_DUP_KEYNAME,
+    errorcode.ER_DUP_FIELDNAME,
+}
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT NOT NULL PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+class MigrationError(Exception):
+    pass
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def checksum(self):
+        return hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+    def statements(self):
+        lines = [line for line in self.sql.splitlines() if not line.lstrip().startswith("--")]
+        return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_RE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            migrations.append(Migration(int(match.group(1)), match.group(2), f.read()))
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError(f"duplicate migration versions in {directory}")
+    return migrations
+
+
+def applied_versions(cursor):
+    cursor.execute(CREATE_MIGRATIONS_TABLE)
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cursor.fetchall())
+
+
+def pending(cursor, migrations):
+    applied = applied_versions(cursor)
+    for migration in migrations:
+        checksum = applied.get(migration.version)
+        if checksum is not None and checksum != migration.checksum:
+            raise MigrationError(
+                f"migration {migration.version:04d}_{migration.name} was edited after it was applied; "
+                "add a new migration instead"
+            )
+    return [m for m in migrations if m.version not in applied]
+
+
+def migrate(conn, migrations=None):
+    """Apply pending migrations in order and return them.
+
+    MySQL commits DDL implicitly, so each statement is applied on its own
+    and the version is recorded once all of its statements have succeeded.
+    A failed migration is therefore safe to fix and re-run.
+    """
+    migrations = load_migrations() if migrations is None else migrations
+    done = []
+    with conn.cursor() as cursor:
+        for migration in pending(cursor, migrations):
+            for statement in migration.statements():
+                try:
+                    cursor.execute(statement)
+                except mysql.connector.Error as e:
+                    if e.errno not in ALREADY_APPLIED:
+                        conn.rollback()
+                        raise MigrationError(f"{migration.version:04d}_{migration.name}: {e}") from e
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (migration.version, migration.name, migration.checksum)
+            )
+            conn.commit()
+            done.append(migration)
+    return done
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    parser.add_argument("--status", action="store_true", help="show applied and pending migrations")
+    parser.add_argument("--explain", action="store_true", help="check hot queries for full scans")
+    args = parser.parse_args()
+
+    config = {
+        "host": os.getenv("DB_HOST"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "database": os.getenv("DB_NAME")
+    }
+    conn = mysql.connector.connect(**config)
+    try:
+        if args.explain:
+            from utils.query_plan import check, format_report
+            problems = check(conn)
+            print(format_report(problems))
+            sys.exit(1 if problems else 0)
+
+        migrations = load_migrations()
+        if args.status:
+            with conn.cursor() as cursor:
+                todo = {m.version for m in pending(cursor, migrations)}
+            for m in migrations:
+                print(f"{'pending' if m.version in todo else 'applied'}  {m.version:04d}_{m.name}")
+            return
+
+        done = migrate(conn, migrations)
+        for m in done:
+            print(f"applied {m.version:04d}_{m.name}")
+        if not done:
+            print("schema is up to date")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# 密碼格式：scrypt$n$r$p$salt$hash，舊資料是明文，登入成功時再改存雜湊
+PREFIX = "scrypt"
+
+
+def _b64(data: bytes):
+    return base64.b64encode(data).decode()
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * n + 1024 * 1024, dklen=32)
+
+
+def hash_password(password: str, n: int, r: int, p: int):
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, n, r, p)
+    return f"{PREFIX}${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+
+
+def parse_hash(stored: str):
+    parts = stored.split("$")
+    if len(parts) != 6 or parts[0] != PREFIX:
+        return None
+    try:
+        return {
+            "n": int(parts[1]), "r": int(parts[2]), "p": int(parts[3]),
+            "salt": base64.b64decode(parts[4]), "hash": base64.b64decode(parts[5])
+        }
+    except ValueError:
+        return None
+
+
+def verify_password(password: str, stored: str):
+    params = parse_hash(stored)
+    if params is None:
+        # 尚未遷移的明文密碼
+        return hmac.compare_digest(password.encode(), stored.encode())
+    digest = _scrypt(password, params["salt"], params["n"], params["r"], params["p"])
+    return hmac.compare_digest(digest, params["hash"])
+
+
+class PasswordHasher:
+    """Runs scrypt hashing and verification on a bounded worker pool so the
+    CPU cost stays off the event loop.
+
+    ``use_processes=True`` switches to a process pool for multi-core scaling.
+    """
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1,
+                 workers: int = 4, use_processes: bool = False):
+        self.n = n
+        self.r = r
+        self.p = p
+        # 帳號不存在時拿來比對的雜湊，讓回應時間和密碼錯誤一樣；啟動時先算好，第一次查詢才不會比較慢
+        self._dummy_hash = hash_password(_b64(os.urandom(16)), n, r, p)
+        if use_processes:
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+
+    def needs_rehash(self, stored: str):
+        params = parse_hash(stored)
+        return params is None or (params["n"], params["r"], params["p"]) != (self.n, self.r, self.p)
+
+    async def hash(self, password: str):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, hash_password, password, self.n, self.r, self.p)
+
+    async def verify(self, password: str, stored: str):
+        """Return ``(ok, new_hash)``; ``new_hash`` is set when the stored value
+        is plaintext or uses old parameters and should be replaced.
+
+        ``stored=None`` (unknown account) still runs a full scrypt against a
+        dummy hash and returns ``(False, None)``, so the response time does
+        not reveal whether the account exists."""
+        loop = asyncio.get_running_loop()
+        if stored is None:
+            await loop.run_in_executor(self._executor, verify_password, password, self._dummy_hash)
+            return False, None
+        ok = await loop.run_in_executor(self._executor, verify_password, password, stored)
+        if ok and self.needs_rehash(stored):
+            return True, await self.hash(password)
+        return ok, None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
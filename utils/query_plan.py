@@ -0,0 +1,108 @@
+"""EXPLAIN the hot queries from app.py and report any that scan a whole table.
+
+    python -m utils.migrate --explain
+
+``HOT_QUERIES`` mirrors the statements the request handlers run per request,
+so keep it in sync when a query in app.py changes. Full reads that only run
+at startup or on catalog refresh (building the search index, the MRT facet,
+OFFSET pagination) are deliberately left out.
+
+Works with MySQL's tabular EXPLAIN output (``type`` = ALL or index means a
+full scan) and with SQLite's EXPLAIN QUERY PLAN (``SCAN <table>``), so it
+can also run against the benchmark stand-in.
+"""
+from collections import namedtuple
+
+HotQuery = namedtuple("HotQuery", "name sql params")
+
+HOT_QUERIES = [
+    HotQuery("get_member_by_email",
+             "SELECT id, name, username, password FROM member WHERE username = %s",
+             ("someone@example.com",)),
+    HotQuery("get_booking_list",
+             "SELECT attraction_id, date, time, price FROM cart WHERE member_id = %s",
+             (1,)),
+    HotQuery("get_booking_list_all",
+             "SELECT number, attraction_id, date, time, price, name, email, phone, status "
+             "FROM orders WHERE member_id = %s AND status = 1 ORDER BY order_time",
+             (1,)),
+    HotQuery("get_order_by_number",
+             "SELECT * FROM orders WHERE number = %s AND member_id = %s",
+             ("abcd1234", 1)),
+    HotQuery("set_order_status",
+             "UPDATE orders SET status = %s WHERE number = %s",
+             (1, "abcd1234")),
+    HotQuery("get_favorite_ids",
+             "SELECT attraction_id FROM favorite WHERE member_id = %s ORDER BY id",
+             (1,)),
+    HotQuery("remove_favorite",
+             "DELETE FROM favorite WHERE attraction_id = %s AND member_id = %s",
+             (1, 1)),
+    HotQuery("fetch_images",
+             "SELECT attraction_id, image_url FROM images WHERE attraction_id IN (%s, %s, %s) "
+             "ORDER BY attraction_id, position",
+             (1, 2, 3)),
+    HotQuery("get_single_attraction",
+             "SELECT a.id, a.name, a.category, a.description, a.address, a.transport, a.mrt, "
+             "a.lat, a.lng, a.cover_image FROM attractions a WHERE a.id = %s",
+             (1,)),
+    HotQuery("get_attractions_by_ids",
+             "SELECT a.id, a.name, a.category, a.description, a.address, a.transport, a.mrt, "
+             "a.lat, a.lng, a.cover_image FROM attractions a WHERE a.id IN (%s, %s, %s)",
+             (1, 2, 3)),
+    HotQuery("get_attraction_summaries",
+             "SELECT id, name, address, cover_image FROM attractions WHERE id IN (%s, %s, %s)",
+             (1, 2, 3)),
+    HotQuery("get_attractions_list (cursor)",
+             "SELECT a.id, a.name FROM (SELECT id FROM attractions WHERE id > %s ORDER BY id LIMIT %s) p "
+             "JOIN attractions a ON a.id = p.id ORDER BY a.id",
+             (12, 13)),
+]
+
+
+def _full_scans(rows, derived=()):
+    scans = []
+    for row in rows:
+        if "detail" in row:
+            # SQLite: "SCAN t", "SCAN t USING INDEX ..."（整個索引也算全掃）
+            detail = row["detail"]
+            if detail.startswith("SCAN "):
+                table = detail.split()[1]
+                if table not in derived:
+                    scans.append(detail)
+            continue
+
+        table = row.get("table")
+        if not table or table.startswith("<"):
+            continue  # 衍生表、常數列
+        if row.get("type") in ("ALL", "index"):
+            scans.append(f"{table}: type={row['type']} key={row.get('key')} rows={row.get('rows')}")
+    return scans
+
+
+def explain(cursor, query: HotQuery):
+    cursor.execute("EXPLAIN " + query.sql, query.params)
+    return cursor.fetchall()
+
+
+def check(conn, queries=HOT_QUERIES):
+    """Return ``[(query name, [scan descriptions])]`` for every query that
+    reads a whole table or index."""
+    problems = []
+    with conn.cursor(dictionary=True) as cursor:
+        for query in queries:
+            scans = _full_scans(explain(cursor, query), derived=("p",))
+            if scans:
+                problems.append((query.name, scans))
+    conn.rollback()
+    return problems
+
+
+def format_report(problems):
+    if not problems:
+        return f"ok: {len(HOT_QUERIES)} hot queries use indexes"
+    lines = ["full scans found:"]
+    for name, scans in problems:
+        lines.append(f"  {name}")
+        lines.extend(f"    {scan}" for scan in scans)
+    return "\n".join(lines)
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ResponseCache:
+    """LRU cache of encoded JSON bodies, bounded by total body bytes.
+
+    Every entry carries a strong ETag derived from the catalog version and
+    the body; bump() moves to a new (or the given) version and drops everything.
+    Entries also expire after ``ttl`` seconds, which bounds how long a worker
+    that missed a bump() keeps serving old bodies.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, ttl: float = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = 1
+        self._data = OrderedDict()  # key -> (body, etag, expire_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                del self._data[key]
+                self._bytes -= len(entry[0])
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[:2]
+
+    def set(self, key, body: bytes, version: int = None):
+        # version：呼叫端開始計算 body 前讀到的 self.version；中間 bump() 過的話 body 可能是舊資料，只回傳不存
+        with self._lock:
+            version = self.version if version is None else version
+            etag = f'"{version}-{hashlib.sha1(body).hexdigest()[:20]}"'
+            entry = (body, etag)
+            if version != self.version or len(body) > self.max_bytes:
+                return entry
+
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            expire_at = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._data[key] = (body, etag, expire_at)
+            self._bytes += len(body)
+
+            while self._bytes > self.max_bytes:
+                _, (evicted, _, _) = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+            return entry
+
+    def bump(self, version: int = None):
+        # 多個 worker 時帶入共用的目錄版本，同一份 body 在每個 worker 拿到同一個 ETag
+        with self._lock:
+            self.version = self.version + 1 if version is None else version
+            self._data.clear()
+            self._bytes = 0
+
+    def respond(self, request, entry):
+        body, etag = entry
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+            }
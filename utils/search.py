@@ -0,0 +1,187 @@
+import struct
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+# pack() 的格式：表頭後依序是 doc id、posting（都是 int64），key/posting/doc 的 uint32 位移表，最後是 key 與 doc 文字
+PACKED_HEADER = struct.Struct("<IIII")  # key 數、doc 數、posting 總數、key 文字長度
+MRT_PREFIX = "\0"  # 捷運站的精確比對和 n-gram 放在同一張 key 表，用前綴區分
+FIELD_SEP = "\0"
+
+
+def normalize(text: str):
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(ch for ch in text if not ch.isspace())
+
+
+def ngrams(text: str):
+    # 中文沒有空白斷詞，用 unigram + bigram 建索引，查詢時用 bigram 交集
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class SearchIndex:
+    """In-memory n-gram inverted index over the attractions catalog.
+
+    Keywords are matched as substrings of name, category, address and
+    description (ranked in that order of weight) plus an exact match on mrt.
+    ``pack()`` turns the index into a flat buffer that ``PackedSearchIndex``
+    searches in place.
+    """
+
+    FIELD_WEIGHTS = {"name": 8, "category": 4, "address": 2, "description": 1}
+    MRT_WEIGHT = 8
+
+    def __init__(self, rows):
+        self._docs = {}
+        self._postings = defaultdict(set)
+        self._mrt = defaultdict(set)
+
+        for row in rows:
+            fields = {field: normalize(row.get(field)) for field in self.FIELD_WEIGHTS}
+            self._docs[row["id"]] = fields
+            for text in fields.values():
+                for gram in ngrams(text):
+                    self._postings[gram].add(row["id"])
+            if row.get("mrt"):
+                self._mrt[row["mrt"]].add(row["id"])
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _posting(self, gram: str):
+        return self._postings.get(gram, set())
+
+    def _mrt_ids(self, mrt: str):
+        return self._mrt.get(mrt, ())
+
+    def _fields(self, attraction_id):
+        return self._docs[attraction_id]
+
+    def pack(self):
+        keys = {gram: ids for gram, ids in self._postings.items()}
+        keys.update((MRT_PREFIX + mrt, ids) for mrt, ids in self._mrt.items())
+        # 依 UTF-8 bytes 排序，讀取端對 bytes 做二分搜尋
+        encoded = sorted((key.encode("utf-8"), sorted(ids)) for key, ids in keys.items())
+        doc_ids = sorted(self._docs)
+
+        key_offsets, posting_offsets, doc_offsets = array("I", [0]), array("I", [0]), array("I", [0])
+        postings = array("q")
+        key_text = bytearray()
+        for key, ids in encoded:
+            key_text += key
+            postings.extend(ids)
+            key_offsets.append(len(key_text))
+            posting_offsets.append(len(postings))
+        doc_text = bytearray()
+        for attraction_id in doc_ids:
+            fields = self._docs[attraction_id]
+            doc_text += FIELD_SEP.join(fields[field] for field in self.FIELD_WEIGHTS).encode("utf-8")
+            doc_offsets.append(len(doc_text))
+
+        return b"".join([
+            PACKED_HEADER.pack(len(encoded), len(doc_ids), len(postings), len(key_text)),
+            bytes(array("q", doc_ids)), bytes(postings),
+            bytes(key_offsets), bytes(posting_offsets), bytes(doc_offsets),
+            bytes(key_text), bytes(doc_text),
+        ])
+
+    def _candidates(self, keyword: str):
+        if len(keyword) == 1:
+            grams = [keyword]
+        else:
+            grams = [keyword[i:i + 2] for i in range(len(keyword) - 1)]
+
+        postings = sorted((self._posting(gram) for gram in set(grams)), key=len)
+        if not postings or not postings[0]:
+            return set()
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            candidates &= ids
+            if not candidates:
+                break
+        return candidates
+
+    def search(self, keyword: str):
+        """Return matching attraction ids, best match first."""
+        scores = defaultdict(int)
+
+        for attraction_id in self._mrt_ids(keyword.strip()):
+            scores[attraction_id] += self.MRT_WEIGHT
+
+        query = normalize(keyword)
+        if query:
+            for attraction_id in self._candidates(query):
+                fields = self._fields(attraction_id)
+                for field, weight in self.FIELD_WEIGHTS.items():
+                    # n-gram 交集可能有誤判，最後再確認整段關鍵字真的出現
+                    if query in fields[field]:
+                        scores[attraction_id] += weight
+                if fields["name"].startswith(query):
+                    scores[attraction_id] += 1
+
+        return sorted((i for i, score in scores.items() if score > 0),
+                      key=lambda i: (-scores[i], i))
+
+
+class PackedSearchIndex(SearchIndex):
+    """``SearchIndex`` over a buffer from ``SearchIndex.pack()``.
+
+    Keys are found by binary search and only the postings and documents a
+    query touches are decoded, so the buffer can be a memoryview into a
+    shared snapshot.
+    """
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        n_keys, n_docs, n_postings, key_length = PACKED_HEADER.unpack_from(view, 0)
+        offset = PACKED_HEADER.size
+
+        def take(size, fmt=None):
+            nonlocal offset
+            part = view[offset:offset + size]
+            offset += size
+            return part.cast(fmt) if fmt else part
+
+        self._doc_ids = take(8 * n_docs, "q")
+        self._postings_view = take(8 * n_postings, "q")
+        self._key_offsets = take(4 * (n_keys + 1), "I")
+        self._posting_offsets = take(4 * (n_keys + 1), "I")
+        self._doc_offsets = take(4 * (n_docs + 1), "I")
+        self._key_text = take(key_length)
+        self._doc_text = view[offset:]
+        self._n_keys = n_keys
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def _find(self, key: str):
+        target = key.encode("utf-8")
+        offsets, text = self._key_offsets, self._key_text
+        lo, hi = 0, self._n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if text[offsets[mid]:offsets[mid + 1]].tobytes() < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n_keys and text[offsets[lo]:offsets[lo + 1]].tobytes() == target:
+            return self._postings_view[self._posting_offsets[lo]:self._posting_offsets[lo + 1]]
+        return None
+
+    def _posting(self, gram: str):
+        ids = self._find(gram)
+        return set(ids) if ids is not None else set()
+
+    def _mrt_ids(self, mrt: str):
+        ids = self._find(MRT_PREFIX + mrt) if mrt else None
+        return list(ids) if ids is not None else ()
+
+    def _fields(self, attraction_id):
+        i = bisect_left(self._doc_ids, attraction_id)
+        text = self._doc_text[self._doc_offsets[i]:self._doc_offsets[i + 1]].tobytes().decode("utf-8")
+        return dict(zip(self.FIELD_WEIGHTS, text.split(FIELD_SEP)))
@@ -0,0 +1,266 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+from utils.response_cache import dumps
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MAGIC = b"TPC2"
+HEADER = struct.Struct("<4sQQ")  # magic, version, index 長度
+VERSION = struct.Struct("<Q")
+ALIGN = 8  # bytes 型別的 extras 以 8 bytes 對齊，讀取端可以直接 cast 成 q/d 陣列
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class SharedSnapshot:
+    """Read-only key/value snapshot shared by every worker process on a host.
+
+    ``publish()`` writes the serialized items to ``snapshot-<version>.bin``
+    in ``directory`` and bumps the counter in the ``version`` file. Every
+    process maps both files, so the items sit in the page cache once per
+    host no matter how many workers read them, and a worker that starts
+    after the first one finds the snapshot ready. Values are decoded per
+    lookup; ``bytes`` extras are stored raw and ``blob()`` returns them as a
+    memoryview into the mapping, so structures packed into them (the search
+    and geo indexes) are read in place instead of being copied into each
+    worker. ``changed()`` is a single read from the mapped counter, cheap
+    enough to call on every request to notice a publish by another worker.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._counter = self._map_file("version", VERSION.size, writable=True)
+        # (version, mmap, {key: (offset, length)}, extras, blobs)；整組替換，讀取端不用上鎖
+        self._state = (0, None, {}, {}, {})
+        self.publishes = 0
+        self.reloads = 0
+
+    def _map_file(self, name, size, writable=False):
+        fd = os.open(os.path.join(self.directory, name), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            return mmap.mmap(fd, size, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+    def _path(self, version):
+        return os.path.join(self.directory, f"snapshot-{version:012d}.bin")
+
+    @contextmanager
+    def _exclusive(self):
+        # 同一台機器上的 worker 之間用 flock 排隊；沒有 fcntl 的平台只擋同一個 process
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(os.path.join(self.directory, "lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    @property
+    def version(self):
+        """Version of the snapshot this process has mapped (0 = none)."""
+        return self._state[0]
+
+    def shared_version(self):
+        return VERSION.unpack_from(self._counter, 0)[0]
+
+    def changed(self):
+        return self.shared_version() != self._state[0]
+
+    def load(self):
+        """Map the latest published snapshot; return False if there is none."""
+        version = self.shared_version()
+        if version == 0:
+            return False
+        if version == self._state[0]:
+            return True
+        try:
+            fd = os.open(self._path(version), os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            data = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        magic, file_version, index_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or file_version != version:
+            return False
+        index = loads(data[HEADER.size:HEADER.size + index_length])
+        base = HEADER.size + index_length
+        items = {key: (base + offset, length) for key, offset, length in index["items"]}
+        extras = {name: (base + offset, length) for name, (offset, length) in index["extras"].items()}
+        blobs = {name: (base + offset, length) for name, (offset, length) in index["blobs"].items()}
+        # 舊的 mmap 不主動 close：其他執行緒可能還在讀，沒有參照後自然釋放
+        self._state = (version, data, items, extras, blobs)
+        self.reloads += 1
+        return True
+
+    def _write(self, version, items, extras):
+        blobs = []
+        index = {"items": [], "extras": {}, "blobs": {}}
+        offset = 0
+        for key, value in items.items():
+            blob = dumps(value)
+            index["items"].append([key, offset, len(blob)])
+            blobs.append(blob)
+            offset += len(blob)
+        for name, value in extras.items():
+            if isinstance(value, (bytes, bytearray)):
+                continue
+            blob = dumps(value)
+            index["extras"][name] = [offset, len(blob)]
+            blobs.append(blob)
+            offset += len(blob)
+        for name, value in extras.items():
+            if not isinstance(value, (bytes, bytearray)):
+                continue
+            padding = -offset % ALIGN
+            blobs.append(b"\0" * padding)
+            offset += padding
+            index["blobs"][name] = [offset, len(value)]
+            blobs.append(bytes(value))
+            offset += len(value)
+        index_blob = dumps(index)
+        # index 後面補空白（JSON 允許），讓資料區從 ALIGN 的倍數開始
+        index_blob += b" " * (-(HEADER.size + len(index_blob)) % ALIGN)
+
+        path = self._path(version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, version, len(index_blob)))
+            f.write(index_blob)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp_path, path)
+
+    def _cleanup(self, version):
+        # 保留目前與上一版，讀到一半的 worker 不受影響（已 mmap 的檔案刪掉也還能讀）
+        for name in os.listdir(self.directory):
+            if not name.startswith("snapshot-") or not name.endswith(".bin"):
+                continue
+            try:
+                if int(name[len("snapshot-"):-len(".bin")]) < version - 1:
+                    os.remove(os.path.join(self.directory, name))
+            except (ValueError, OSError):
+                continue
+
+    def _publish_locked(self, build):
+        items, extras = build()
+        version = self.shared_version() + 1
+        self._write(version, items, extras)
+        VERSION.pack_into(self._counter, 0, version)
+        self._counter.flush()
+        self.publishes += 1
+        self._cleanup(version)
+        return version
+
+    def publish(self, build):
+        """Write a new version from ``build() -> (items, extras)`` and
+        broadcast it to every worker. Returns the new version."""
+        with self._exclusive():
+            version = self._publish_locked(build)
+        self.load()
+        return version
+
+    def ensure(self, build):
+        """Map the current snapshot, publishing one first if none exists.
+
+        Workers that start together queue on the lock, so only the first
+        one runs ``build``.
+        """
+        if self.load():
+            return False
+        with self._exclusive():
+            if self.load():
+                return False
+            self._publish_locked(build)
+        self.load()
+        return True
+
+    def __contains__(self, key):
+        return key in self._state[2]
+
+    def __len__(self):
+        return len(self._state[2])
+
+    def keys(self):
+        return list(self._state[2])
+
+    def get(self, key, default=None):
+        _, data, items, _, _ = self._state
+        entry = items.get(key)
+        if entry is None:
+            return default
+        offset, length = entry
+        return loads(data[offset:offset + length])
+
+    def get_many(self, keys):
+        _, data, items, _, _ = self._state
+        found = {}
+        for key in keys:
+            entry = items.get(key)
+            if entry is not None:
+                offset, length = entry
+                found[key] = loads(data[offset:offset + length])
+        return found
+
+    def values(self):
+        _, data, items, _, _ = self._state
+        for offset, length in items.values():
+            yield loads(data[offset:offset + length])
+
+    def extra(self, name, default=None):
+        _, data, _, extras, _ = self._state
+        entry = extras.get(name)
+        if entry is None:
+            return default
+        offset, length = entry
+        return loads(data[offset:offset + length])
+
+    def blob(self, name):
+        """Return a ``bytes`` extra as a read-only memoryview into the
+        mapping (no copy), or None. Stays valid after later reloads."""
+        _, data, _, _, blobs = self._state
+        entry = blobs.get(name)
+        if entry is None:
+            return None
+        offset, length = entry
+        return memoryview(data)[offset:offset + length]
+
+    def stats(self):
+        version, data, items, _, blobs = self._state
+        return {
+            "directory": self.directory,
+            "version": version,
+            "shared_version": self.shared_version(),
+            "items": len(items),
+            "blobs": {name: length for name, (_, length) in blobs.items()},
+            "bytes": len(data) if data is not None else 0,
+            "publishes": self.publishes,
+            "reloads": self.reloads,
+        }
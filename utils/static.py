@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import unquote
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+STATIC_REF_RE = re.compile(r'((?:src|href)=")(\.?/static/[^"?#]+)(")')
+
+
+def accepted_encodings(header: str):
+    """Parse an Accept-Encoding header into ``{coding: q}``."""
+    accepted = {}
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+class Asset:
+    def __init__(self, body: bytes, media_type: str):
+        self.body = body
+        self.media_type = media_type
+        self.hash = hashlib.sha256(body).hexdigest()[:12]
+        self.etag = f'"{self.hash}"'
+        self.variants = {}
+
+        if media_type.startswith(COMPRESSIBLE_TYPES):
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants["br"] = compressed
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants["gzip"] = compressed
+
+    def respond(self, request, immutable: bool = False):
+        # 逐項解析，q=0 代表明確拒絕；沒列出的編碼依 "*" 的 q 決定
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        wildcard = accepted.get("*", 0.0)
+        candidates = [(accepted.get(e, wildcard), e) for e in ("br", "gzip") if e in self.variants]
+        q, encoding = max(candidates, key=lambda c: c[0], default=(0.0, None))
+        if q <= 0:
+            encoding = None
+        # 不同編碼是不同的表示，ETag 也要不同
+        etag = f'"{self.hash}-{encoding}"' if encoding else self.etag
+
+        headers = {
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "public, max-age=31536000, immutable" if immutable else "no-cache",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return Response(content=self.variants[encoding], media_type=self.media_type, headers=headers)
+        return Response(content=self.body, media_type=self.media_type, headers=headers)
+
+
+class StaticAssets:
+    """Loads every file under ``directory`` into memory at startup together
+    with its gzip/brotli variants.
+
+    HTML shells get their /static references rewritten to ``?v=<hash>``
+    URLs, which are then served with an immutable Cache-Control.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.assets = {}
+        self.pages = {}
+
+        for root, _, files in os.walk(directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                rel_path = os.path.relpath(full_path, directory).replace(os.sep, "/")
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                with open(full_path, "rb") as f:
+                    self.assets[rel_path] = Asset(f.read(), media_type)
+
+        for rel_path, asset in list(self.assets.items()):
+            if rel_path.endswith(".html"):
+                html = STATIC_REF_RE.sub(self._versioned_ref, asset.body.decode("utf-8"))
+                self.pages[rel_path] = Asset(html.encode("utf-8"), "text/html")
+
+    def _versioned_ref(self, match):
+        prefix, url, suffix = match.groups()
+        rel_path = unquote(url.split("/static/", 1)[1])
+        asset = self.assets.get(rel_path)
+        if asset is None:
+            return match.group(0)
+        return f"{prefix}{url}?v={asset.hash}{suffix}"
+
+    def page(self, request, name: str):
+        return self.pages[name].respond(request)
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        rel_path = unquote(request.url.path.split("/static/", 1)[-1]).lstrip("/")
+        asset = self.assets.get(rel_path)
+
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            response = Response(status_code=404 if asset is None else 405)
+        else:
+            response = asset.respond(request, immutable=request.query_params.get("v") == asset.hash)
+        await response(scope, receive, send)
@@ -0,0 +1,186 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+
+SANDBOX_URL = "https://sandbox.tappaysdk.com/tpc/payment/pay-by-prime"
+SANDBOX_RECORD_URL = "https://sandbox.tappaysdk.com/tpc/transaction/query"
+
+# Record API 的 record_status：0 授權、1 請款完成、2 部分退款都代表錢已經扣了；4 是銀行還在處理
+RECORD_CHARGED = {0, 1, 2}
+RECORD_PENDING = {4}
+
+
+class TapPayError(Exception):
+    """The charge definitely did not go through."""
+
+
+class TapPayUnknownError(TapPayError):
+    """The request may have reached TapPay; the charge may or may not exist."""
+
+
+class TapPayClient:
+    """Async pay-by-prime client with a keep-alive connection pool.
+
+    Only failures where the request never reached TapPay (connect errors,
+    connect/pool timeouts) are retried, since charging a prime is not
+    idempotent. Those raise ``TapPayError``; anything that can happen after
+    the request was sent (read timeouts, cut-off or malformed responses,
+    5xx) raises ``TapPayUnknownError``, and ``find_payment()`` looks the
+    charge up by order number to settle it later.
+    """
+
+    def __init__(self, partner_key: str, merchant_id: str, url: str = SANDBOX_URL,
+                 record_url: str = SANDBOX_RECORD_URL,
+                 max_connections: int = 20, max_concurrency: int = 20,
+                 connect_timeout: float = 5, read_timeout: float = 15,
+                 write_timeout: float = 5, pool_timeout: float = 5,
+                 retries: int = 2, backoff: float = 0.2, transport=None, metrics=None):
+        self.partner_key = partner_key
+        self.merchant_id = merchant_id
+        self.url = url
+        self.record_url = record_url
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.transport = transport
+        self.metrics = metrics
+        self.timeout = httpx.Timeout(connect=connect_timeout, read=read_timeout,
+                                     write=write_timeout, pool=pool_timeout)
+
+        self._client = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._requests = 0
+        self._failures = 0
+        self._retried = 0
+        self._in_flight = 0
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                transport=self.transport,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                headers={"Content-Type": "application/json", "x-api-key": self.partner_key or ""}
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def pay_by_prime(self, prime: str, amount: int, details: str, cardholder: dict,
+                           order_number: str = None):
+        client = self._get_client()
+        payload = {
+            "prime":       prime,
+            "partner_key": self.partner_key,
+            "merchant_id": self.merchant_id,
+            "amount":      amount,
+            "details":     details[:100],
+            "cardholder":  cardholder,
+            "remember":    False
+        }
+        if order_number:
+            # 帶上訂單編號，扣款結果不明時才能用 find_payment 查回來
+            payload["order_number"] = order_number
+
+        async with self._semaphore:
+            self._in_flight += 1
+            started = time.perf_counter()
+            ok = False
+            try:
+                for attempt in range(self.retries + 1):
+                    try:
+                        r = await client.post(self.url, json=payload)
+                        r.raise_for_status()
+                        result = r.json()
+                        if not isinstance(result, dict):
+                            raise ValueError(f"unexpected body: {r.text[:200]!r}")
+                        ok = True
+                        return result
+                    except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                        if attempt == self.retries:
+                            raise TapPayError(f"TapPay 連線失敗：{e!r}") from e
+                        with self._lock:
+                            self._retried += 1
+                        await asyncio.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+                    except httpx.HTTPStatusError as e:
+                        # 4xx 是 TapPay 拒絕這個請求；5xx 不知道扣款做到哪裡
+                        if e.response.status_code < 500:
+                            raise TapPayError(f"TapPay 請求失敗：{e!r}") from e
+                        raise TapPayUnknownError(f"TapPay 請求失敗：{e!r}") from e
+                    except httpx.HTTPError as e:
+                        # 讀取逾時、連線中斷：請求已經送出，錢可能已經扣了也可能沒有
+                        raise TapPayUnknownError(f"TapPay 請求失敗：{e!r}") from e
+                    except ValueError as e:
+                        # 非 JSON 或被截斷的回應：同上，結果不明
+                        raise TapPayUnknownError(f"TapPay 回應格式錯誤：{e!r}") from e
+            except TapPayError:
+                with self._lock:
+                    self._failures += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                self._in_flight -= 1
+                with self._lock:
+                    self._requests += 1
+                    self._latencies.append(elapsed)
+                if self.metrics is not None:
+                    self.metrics.observe_tappay(elapsed, ok)
+
+    async def find_payment(self, order_number: str):
+        """Look up the charge made with ``order_number``.
+
+        Returns the trade record, or None when TapPay has no charge for it.
+        Raises ``TapPayError`` when the lookup itself fails.
+        """
+        client = self._get_client()
+        payload = {
+            "partner_key": self.partner_key,
+            "records_per_page": 1,
+            "filters": {"order_number": order_number}
+        }
+        try:
+            r = await client.post(self.record_url, json=payload)
+            r.raise_for_status()
+            result = r.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise TapPayError(f"TapPay 查詢失敗：{e!r}") from e
+        if not isinstance(result, dict) or result.get("status") not in (0, 2):
+            # status 2 是沒有（更多）紀錄，其他非 0 都是查詢本身失敗
+            raise TapPayError(f"TapPay 查詢失敗：{str(result)[:200]}")
+        records = [r for r in result.get("trade_records") or [] if r.get("order_number") == order_number]
+        return records[0] if records else None
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            requests_count = self._requests
+            failures = self._failures
+            retried = self._retried
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 3)
+
+        return {
+            "requests": requests_count,
+            "failures": failures,
+            "retries": retried,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "latency_p50_ms": percentile(0.50),
+            "latency_p99_ms": percentile(0.99),
+            "latency_max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None